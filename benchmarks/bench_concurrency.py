@@ -0,0 +1,113 @@
+"""
+Compare request latency of the sync table endpoints and the `async_db` ones under many concurrent clients.
+
+Each client requests random items by ID, like the UI’s detail views. Sync endpoints wait for one of the thread pool’s
+40 threads, async ones await aiosqlite on the event loop. Only names are requested, so the database access dominates.
+Run as `python benchmarks/bench_concurrency.py`.
+"""
+
+import asyncio
+import multiprocessing
+import random
+import socket
+import statistics
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter, sleep
+from typing import Annotated
+
+import httpx
+import typer
+import uvicorn
+from catalogue import write_catalogue
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from boh_app.data import load_data
+from boh_app.database import create_db_engine, load_db
+from boh_app.models import Item
+from boh_app.server import create_app
+
+MODES = {"sync": False, "async": True}
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(port: int) -> None:
+    while True:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:  # uvicorn only listens once the app has started
+            sleep(0.05)
+
+
+async def load(base_url: str, item_ids: list[str], *, clients: int, requests: int) -> list[float]:
+    latencies: list[float] = []
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async def client(http: httpx.AsyncClient, rng: random.Random) -> None:
+        for _ in range(requests):
+            start = perf_counter()
+            response = await http.get(f"/item/{rng.choice(item_ids)}", params={"fields": "name,known"})
+            response.raise_for_status()
+            latencies.append(perf_counter() - start)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as http:
+        await asyncio.gather(*(client(http, random.Random(i)) for i in range(clients)))  # noqa: S311  # reproducible
+    return latencies
+
+
+def serve(db_path: Path, port: int, *, async_db: bool) -> None:
+    engine = create_db_engine(f"sqlite+pysqlite:///{db_path}")
+    uvicorn.run(create_app(engine, snapshot=None, async_db=async_db), port=port, log_level="warning")
+
+
+def run(db_path: Path, item_ids: list[str], *, async_db: bool, clients: int, requests: int) -> dict[str, float]:
+    port = get_free_port()
+    # a separate process, so the clients don’t compete with the server for the GIL
+    server = multiprocessing.Process(target=serve, args=(db_path, port), kwargs={"async_db": async_db})
+    server.start()
+    wait_for_server(port)
+
+    start = perf_counter()
+    latencies = asyncio.run(load(f"http://127.0.0.1:{port}", item_ids, clients=clients, requests=requests))
+    elapsed = perf_counter() - start
+    server.terminate()
+    server.join()
+
+    [p50, p95, p99] = [statistics.quantiles(latencies, n=100)[p - 1] * 1e3 for p in (50, 95, 99)]
+    return {"req/s": len(latencies) / elapsed, "p50 ms": p50, "p95 ms": p95, "p99 ms": p99}
+
+
+def main(
+    clients: Annotated[int, typer.Option(help="Number of concurrent clients")] = 100,
+    requests: Annotated[int, typer.Option(help="Requests per client")] = 10,
+) -> None:
+    with TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        write_catalogue(tmp_path / "cache")
+        load_data.CACHE_DIR = tmp_path / "cache"
+        engine = create_db_engine(f"sqlite+pysqlite:///{tmp_path}/db.sqlite")
+        mk_session = sessionmaker(autoflush=False, bind=engine)
+        load_db(engine, mk_session, snapshot=None)
+        with mk_session() as session:
+            item_ids = list(session.scalars(select(Item.id)))
+        engine.dispose()
+
+        results = {
+            mode: run(tmp_path / "db.sqlite", item_ids, async_db=async_db, clients=clients, requests=requests)
+            for mode, async_db in MODES.items()
+        }
+
+    print(f"{'':<8}" + "".join(f"{key:>10}" for key in results["sync"]))
+    for mode, result in results.items():
+        print(f"{mode:<8}" + "".join(f"{value:>10.1f}" for value in result.values()))
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,43 @@
+"""
+Compare the time spent parsing and validating the frontend’s GraphQL documents per request,
+as ariadne does by default and with the `DocumentCache` of persisted queries.
+
+Run as `python benchmarks/bench_documents.py`.
+"""
+
+from time import perf_counter
+from typing import Annotated
+
+import typer
+from graphql import parse, validate
+
+from boh_app.graphql import get_gql_schema
+from boh_app.persisted_queries import DocumentCache, load_persisted_queries
+
+
+def main(repeat: Annotated[int, typer.Option(help="Requests per document")] = 200) -> None:
+    schema = get_gql_schema()
+    persisted = load_persisted_queries()
+    documents = DocumentCache(persisted)
+    # as urql sends them
+    queries = [" ".join(query.split()) for query in persisted.values()]
+
+    results = {}
+    for name, parse_validate in {
+        "default": lambda query: validate(schema, parse(query)),
+        "cached": lambda query: documents.validate(schema, documents.parse(None, {"query": query})),
+    }.items():
+        start = perf_counter()
+        for _ in range(repeat):
+            for query in queries:
+                assert not parse_validate(query)
+        results[name] = (perf_counter() - start) / repeat / len(queries)
+
+    print(f"{'':<10}{'per request':>14}")
+    for name, result in results.items():
+        print(f"{name:<10}{result * 1e6:>12.1f}µs")
+    print(f"{'speedup':<10}{results['default'] / results['cached']:>13.0f}×")
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,106 @@
+"""
+Check that GraphQL throughput and server memory stay flat over a long run of concurrent clients.
+
+Each client keeps posting queries like the UI’s skill and workstation views. Every interval, the requests completed
+in it and the server’s resident memory are printed. Each operation runs on its own session, which is closed afterwards,
+so neither the identity map nor the number of connections should grow.
+Run as `python benchmarks/bench_graphql.py` (Linux only, as the memory is read from ``/proc``).
+"""
+
+import asyncio
+import multiprocessing
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Annotated
+
+import httpx
+import typer
+import uvicorn
+from bench_concurrency import get_free_port, wait_for_server
+from catalogue import write_catalogue
+from sqlalchemy.orm import sessionmaker
+
+from boh_app.data import load_data
+from boh_app.database import create_db_engine, load_db
+from boh_app.server import create_app
+
+QUERIES = [
+    "query { skill { id level primary_principle wisdoms { id } recipes { id } } }",
+    "query { workstation { id workstation_slots { id accepts { id } } evolves { id } } }",
+]
+
+
+def get_rss(pid: int) -> int:
+    """Resident memory of process `pid` in bytes."""
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) * 1024
+    raise ValueError(f"No VmRSS for process {pid}")
+
+
+async def load(base_url: str, pid: int, *, clients: int, duration: float, interval: float) -> list[tuple[float, int, int]]:
+    """Run `clients` for `duration` seconds and return (time, requests, rss) per interval."""
+    completed = 0
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    end = perf_counter() + duration
+
+    async def client(http: httpx.AsyncClient, i: int) -> None:
+        nonlocal completed
+        while perf_counter() < end:
+            response = await http.post("/graphql", json={"query": QUERIES[(completed + i) % len(QUERIES)]})
+            response.raise_for_status()
+            if "errors" in (body := response.json()):
+                raise RuntimeError(body["errors"])
+            completed += 1
+
+    async def sample() -> list[tuple[float, int, int]]:
+        samples = []
+        start = perf_counter()
+        while (now := perf_counter()) < end:
+            await asyncio.sleep(min(interval, end - now))
+            samples.append((perf_counter() - start, completed, get_rss(pid)))
+        return samples
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as http:
+        samples, *_ = await asyncio.gather(sample(), *(client(http, i) for i in range(clients)))
+    return samples
+
+
+def serve(db_path: Path, port: int) -> None:
+    engine = create_db_engine(f"sqlite+pysqlite:///{db_path}")
+    uvicorn.run(create_app(engine, snapshot=None), port=port, log_level="warning")
+
+
+def main(
+    clients: Annotated[int, typer.Option(help="Number of concurrent clients")] = 20,
+    duration: Annotated[float, typer.Option(help="Length of the run in seconds")] = 120,
+    interval: Annotated[float, typer.Option(help="Seconds between samples")] = 10,
+) -> None:
+    with TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        write_catalogue(tmp_path / "cache")
+        load_data.CACHE_DIR = tmp_path / "cache"
+        engine = create_db_engine(f"sqlite+pysqlite:///{tmp_path}/db.sqlite")
+        load_db(engine, sessionmaker(autoflush=False, bind=engine), snapshot=None)
+        engine.dispose()
+
+        port = get_free_port()
+        server = multiprocessing.Process(target=serve, args=(tmp_path / "db.sqlite", port))
+        server.start()
+        wait_for_server(port)
+        try:
+            samples = asyncio.run(load(f"http://127.0.0.1:{port}", server.pid, clients=clients, duration=duration, interval=interval))
+        finally:
+            server.terminate()
+            server.join()
+
+    print(f"{'seconds':>8}{'req/s':>10}{'RSS MiB':>10}")
+    previous_time, previous_count = 0.0, 0
+    for time, count, rss in samples:
+        print(f"{time:>8.0f}{(count - previous_count) / (time - previous_time):>10.1f}{rss / 2**20:>10.1f}")
+        previous_time, previous_count = time, count
+
+
+if __name__ == "__main__":
+    typer.run(main)
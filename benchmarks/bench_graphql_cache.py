@@ -0,0 +1,59 @@
+"""
+Compare the time per request of the frontend’s GraphQL queries with and without the result cache.
+
+Without the cache, every request executes the query and encodes its result. With it, only the table versions are read.
+Run as `python benchmarks/bench_graphql_cache.py`.
+"""
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Annotated
+
+import typer
+from catalogue import write_catalogue
+from fastapi.testclient import TestClient
+
+from boh_app.data import load_data
+from boh_app.database import create_db_engine
+from boh_app.persisted_queries import load_persisted_queries
+from boh_app.server import create_app
+
+
+def time_per_request(client: TestClient, query: str, repeat: int) -> float:
+    start = perf_counter()
+    for _ in range(repeat):
+        client.post("/graphql", json={"query": query}).raise_for_status()
+    return (perf_counter() - start) / repeat
+
+
+def main(repeat: Annotated[int, typer.Option(help="Requests per query and mode")] = 20) -> None:
+    queries = {query.split()[1]: query for query in load_persisted_queries().values()}
+    results: dict[str, dict[str, float]] = {}
+    with TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        write_catalogue(tmp_path / "cache")
+        load_data.CACHE_DIR = tmp_path / "cache"
+        engine = create_db_engine(f"sqlite+pysqlite:///{tmp_path}/db.sqlite")
+        with TestClient(create_app(engine, snapshot=None)) as client:
+            cache = client.app.state.graphql_cache
+            max_bytes = cache.max_bytes
+            for mode, mode_max_bytes in {"uncached": 0, "cached": max_bytes}.items():
+                cache.clear()
+                cache.max_bytes = mode_max_bytes  # no result fits into 0 bytes
+                for name, query in queries.items():
+                    if "errors" in (response := client.post("/graphql", json={"query": query})).json():  # also warms up
+                        typer.echo(f"Skipping {name}: {response.json()['errors'][0]['message']}", err=True)
+                        continue
+                    results.setdefault(name, {})[mode] = time_per_request(client, query, repeat)
+        engine.dispose()
+
+    print(f"{'query':<14}{'uncached':>12}{'cached':>12}{'speedup':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<14}{result['uncached'] * 1e3:>10.2f}ms{result['cached'] * 1e3:>10.2f}ms{result['uncached'] / result['cached']:>9.1f}×"
+        )
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,68 @@
+"""
+Compare loading data files through marshmallow (`add_data`) and through Core (`bulk_load`).
+
+Run as `python benchmarks/bench_load_data.py`. Uses a synthetic catalogue unless `--real` is passed,
+in which case the files written by `gen-all` are used.
+"""
+
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Annotated
+
+import typer
+from catalogue import write_catalogue
+from sqlalchemy import create_engine
+from sqlalchemy.orm import configure_mappers, sessionmaker
+
+from boh_app.data import load_data
+from boh_app.data.bulk import bulk_load
+from boh_app.models import Base, get_tablename_model_mapping
+from boh_app.serializers import setup_schema
+
+LOADERS = {"marshmallow": load_data.add_data, "bulk": bulk_load}
+
+
+def time_loader(loader_name: str, db_path: Path) -> dict[str, float]:
+    engine = create_engine(f"sqlite+pysqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+    mk_session = sessionmaker(autoflush=False, bind=engine)
+    session = mk_session()
+    setup_schema(Base, session=session)
+    tablename2model = get_tablename_model_mapping()
+    data_file_paths = load_data.find_files()
+
+    timings = {}
+    for table in load_data.get_sorted_tables():
+        if (path := data_file_paths.get(table.fullname)) is None:
+            continue
+        data = json.loads(path.read_bytes())
+        start = perf_counter()
+        with session.begin():
+            LOADERS[loader_name](data, tablename2model[table.fullname], session=session)
+        timings[table.fullname] = perf_counter() - start
+    session.close()
+    engine.dispose()
+    return timings
+
+
+def main(real: Annotated[bool, typer.Option(help="Use files written by `gen-all`")] = False) -> None:
+    configure_mappers()
+    with TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        if not real:
+            write_catalogue(tmp_path / "cache")
+            load_data.CACHE_DIR = tmp_path / "cache"
+        results = {name: time_loader(name, tmp_path / f"{name}.sqlite") for name in LOADERS}
+
+    print(f"{'table':<20}" + "".join(f"{name:>14}" for name in LOADERS) + f"{'speedup':>10}")
+    for table in results["marshmallow"]:
+        times = [results[name][table] for name in LOADERS]
+        print(f"{table:<20}" + "".join(f"{t * 1000:>12.1f}ms" for t in times) + f"{times[0] / times[1]:>9.1f}×")
+    totals = [sum(results[name].values()) for name in LOADERS]
+    print(f"{'total':<20}" + "".join(f"{t * 1000:>12.1f}ms" for t in totals) + f"{totals[0] / totals[1]:>9.1f}×")
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,91 @@
+"""
+Compare the per-row cost of encoding REST responses the way FastAPI does with a `response_model`,
+and the way `fieldsets.dump_json` does.
+
+FastAPI validates the returned list against the `response_model` again, converts it to Python objects,
+and encodes those with the stdlib `json`. `dump_json` validates the ORM objects once
+and has pydantic’s serializer write the bytes.
+Run as `python benchmarks/bench_serialization.py`.
+"""
+
+import json
+from collections.abc import Callable, Sequence
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Annotated, Any
+
+import typer
+from catalogue import write_catalogue
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import configure_mappers, sessionmaker
+
+from boh_app.data import load_data
+from boh_app.database import load_db
+from boh_app.fieldsets import dump_json
+from boh_app.loading import get_loader_options
+from boh_app.models import Base, get_tablename_model_mapping
+from boh_app.serializers import setup_schema
+
+TABLES = ["item", "recipe", "workstation"]
+
+
+def encode_response_model(model: type[Base], rows: Sequence[Base]) -> bytes:
+    adapter = TypeAdapter(list[model.__pydantic__])
+    validated = [model.__pydantic__.model_validate(row) for row in rows]  # in the endpoint
+    revalidated = adapter.validate_python(validated, from_attributes=True)  # against the response_model
+    content = adapter.dump_python(revalidated, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def encode_dump_json(model: type[Base], rows: Sequence[Base]) -> bytes:
+    return dump_json(model, None, rows)
+
+
+ENCODERS: dict[str, Callable[[type[Base], Sequence[Base]], bytes]] = {
+    "response_model": encode_response_model,
+    "dump_json": encode_dump_json,
+}
+
+
+def time_per_row(encode: Callable[[type[Base], Sequence[Base]], bytes], model: type[Base], rows: Sequence[Base], repeat: int) -> float:
+    encode(model, rows)  # warm up caches
+    start = perf_counter()
+    for _ in range(repeat):
+        encode(model, rows)
+    return (perf_counter() - start) / repeat / len(rows)
+
+
+def main(repeat: Annotated[int, typer.Option(help="Encodings per table and encoder")] = 10) -> None:
+    configure_mappers()
+    with TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        write_catalogue(tmp_path / "cache")
+        load_data.CACHE_DIR = tmp_path / "cache"
+        engine = create_engine(f"sqlite+pysqlite:///{tmp_path}/db.sqlite")
+        mk_session = sessionmaker(autoflush=False, bind=engine)
+        load_db(engine, mk_session, snapshot=None)
+
+        results: dict[str, dict[str, Any]] = {}
+        with mk_session() as session:
+            setup_schema(Base, session=session)
+            tablename2model = get_tablename_model_mapping()
+            for table in TABLES:
+                model = tablename2model[table]
+                rows = session.scalars(select(model).options(*get_loader_options(model))).all()
+                assert encode_response_model(model, rows) == encode_dump_json(model, rows)
+                results[table] = {
+                    "rows": len(rows),
+                    **{name: time_per_row(encode, model, rows, repeat) for name, encode in ENCODERS.items()},
+                }
+        engine.dispose()
+
+    print(f"{'table':<14}{'rows':>6}" + "".join(f"{name:>16}" for name in ENCODERS) + f"{'speedup':>10}")
+    for table, result in results.items():
+        times = [result[name] for name in ENCODERS]
+        print(f"{table:<14}{result['rows']:>6}" + "".join(f"{t * 1e6:>14.1f}µs" for t in times) + f"{times[0] / times[1]:>9.1f}×")
+
+
+if __name__ == "__main__":
+    typer.run(main)
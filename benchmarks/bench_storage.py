@@ -0,0 +1,95 @@
+"""
+Compare read throughput of SQLite’s default settings and `DEFAULT_PROFILE` while another thread keeps writing.
+
+Readers list all items, like `GET /item`. The writer toggles `known` flags, like the UI’s `PATCH /item/{id}` requests.
+Run as `python benchmarks/bench_storage.py`.
+"""
+
+import random
+import threading
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter, sleep
+from typing import Annotated
+
+import typer
+from catalogue import write_catalogue
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from boh_app.data import load_data
+from boh_app.database import DEFAULT_PROFILE, SQLITE_DEFAULTS, StorageProfile, create_db_engine, load_db
+from boh_app.models import Item
+
+PROFILES = {"sqlite defaults": SQLITE_DEFAULTS, "profile": DEFAULT_PROFILE}
+
+
+def run(profile: StorageProfile, db_path: Path, *, readers: int, duration: float) -> dict[str, float]:
+    engine = create_db_engine(f"sqlite+pysqlite:///{db_path}", profile)
+    mk_session = sessionmaker(autoflush=False, bind=engine)
+    load_db(engine, mk_session, snapshot=None)
+    with mk_session() as session:
+        item_ids = list(session.scalars(select(Item.id)))
+
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def count(key: str) -> None:
+        with lock:
+            counts[key] += 1
+
+    def read() -> None:
+        while not stop.is_set():
+            try:
+                with mk_session() as session:
+                    session.scalars(select(Item)).all()
+                count("reads")
+            except OperationalError:  # database is locked
+                count("errors")
+
+    def write() -> None:
+        rng = random.Random(0)  # noqa: S311  # reproducible, not for security
+        while not stop.is_set():
+            try:
+                with mk_session() as session, session.begin():
+                    item = session.get_one(Item, rng.choice(item_ids))
+                    item.known = not item.known
+                count("writes")
+            except OperationalError:
+                count("errors")
+
+    threads = [threading.Thread(target=read) for _ in range(readers)] + [threading.Thread(target=write)]
+    start = perf_counter()
+    for thread in threads:
+        thread.start()
+    sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - start
+    engine.dispose()
+    return {"reads/s": counts["reads"] / elapsed, "writes/s": counts["writes"] / elapsed, "errors": counts["errors"]}
+
+
+def main(
+    readers: Annotated[int, typer.Option(help="Number of reading threads")] = 8,
+    duration: Annotated[float, typer.Option(help="Seconds to run each profile for")] = 5.0,
+) -> None:
+    with TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        write_catalogue(tmp_path / "cache")
+        load_data.CACHE_DIR = tmp_path / "cache"
+        results = {
+            name: run(profile, tmp_path / f"{i}.sqlite", readers=readers, duration=duration)
+            for i, (name, profile) in enumerate(PROFILES.items())
+        }
+
+    print(f"{'':<16}" + "".join(f"{key:>12}" for key in results["profile"]))
+    for name, result in results.items():
+        print(f"{name:<16}" + "".join(f"{value:>12.1f}" for value in result.values()))
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,88 @@
+"""
+Compare the per-request cost of `PUT /skill/{id}` through marshmallow, as the endpoints used to write,
+and through the model’s `Writer`.
+
+Each request gets the skill, applies a payload that changes its level and one of its wisdoms, and flushes.
+Run as `python benchmarks/bench_writes.py`.
+"""
+
+from collections.abc import Callable
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Annotated, Any
+
+import typer
+from catalogue import write_catalogue
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, configure_mappers, sessionmaker
+
+from boh_app.data import load_data
+from boh_app.database import load_db
+from boh_app.models import Base, Skill, Wisdom
+from boh_app.serializers import setup_schema
+from boh_app.writers import get_writer
+
+
+def update_marshmallow(session: Session, item: Base, data: dict[str, Any]) -> None:
+    # marshmallow loads nested items as model objects, which can be set on model
+    m_item: Base = type(item).__marshmallow__(session=session).load(data)
+    for field in data:
+        setattr(item, field, getattr(m_item, field))
+
+
+def update_writer(session: Session, item: Base, data: dict[str, Any]) -> None:
+    get_writer(type(item)).update(session, item, data)
+
+
+WRITERS: dict[str, Callable[[Session, Base, dict[str, Any]], None]] = {
+    "marshmallow": update_marshmallow,
+    "writer": update_writer,
+}
+
+
+def time_per_request(
+    update: Callable[[Session, Base, dict[str, Any]], None], session: Session, payloads: list[dict[str, Any]], repeat: int
+) -> float:
+    start = perf_counter()
+    for _ in range(repeat):
+        for payload in payloads:
+            with session.begin():
+                item = session.get_one(Skill, payload["id"])
+                update(session, item, payload)
+                session.flush()
+    return (perf_counter() - start) / repeat / len(payloads)
+
+
+def main(repeat: Annotated[int, typer.Option(help="Passes over all skills per writer")] = 5) -> None:
+    configure_mappers()
+    with TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        write_catalogue(tmp_path / "cache")
+        load_data.CACHE_DIR = tmp_path / "cache"
+        engine = create_engine(f"sqlite+pysqlite:///{tmp_path}/db.sqlite")
+        mk_session = sessionmaker(autoflush=False, bind=engine)
+        load_db(engine, mk_session, snapshot=None)
+
+        with mk_session() as session:
+            setup_schema(Base, session=session)
+            wisdoms = list(session.scalars(select(Wisdom.id)))
+            payloads = [
+                Skill.__pydantic_put__.model_validate(skill).model_dump()
+                | {"level": i % 10, "wisdoms": [{"id": w.id} for w in skill.wisdoms[:1]] + [{"id": wisdoms[i % len(wisdoms)]}]}
+                for i, skill in enumerate(session.scalars(select(Skill)))
+            ]
+        results = {}
+        for name, update in WRITERS.items():
+            with mk_session() as session:
+                results[name] = time_per_request(update, session, payloads, repeat)
+        engine.dispose()
+
+    print(f"{'writer':<14}{'per request':>14}")
+    for name, result in results.items():
+        print(f"{name:<14}{result * 1e6:>12.1f}µs")
+    print(f"{'speedup':<14}{results['marshmallow'] / results['writer']:>13.1f}×")
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,70 @@
+"""Synthetic stand-ins for the files `gen-all` writes, sized like the real catalogue."""
+
+import json
+import random
+from pathlib import Path
+from typing import Any
+
+from boh_app.data.load_data import get_data
+from boh_app.data.types import Principle
+
+
+def mk_catalogue(n_items: int = 2000, n_recipes: int = 1500, n_skills: int = 80, seed: int = 0) -> dict[str, list[dict[str, Any]]]:
+    rng = random.Random(seed)  # noqa: S311  # reproducible, not for security
+    aspects = [a["id"] for a in get_data("aspect")]
+    wisdoms = [w["id"] for w in get_data("wisdom")]
+    principles = list(Principle)
+
+    skills = [
+        {
+            "id": f"s.skill{i}",
+            "name": f"Skill {i}",
+            "primary_principle": p1,
+            "secondary_principle": p2,
+            "wisdoms": [{"id": w} for w in rng.sample(wisdoms, 2)],
+        }
+        for i in range(n_skills)
+        for p1, p2 in [rng.sample(principles, 2)]
+    ]
+    items = [
+        {
+            "id": f"item{i}",
+            "name": f"Item {i}",
+            "aspects": [{"id": a} for a in rng.sample(aspects, rng.randint(1, 5))],
+            **{p: rng.randint(1, 6) for p in rng.sample(principles, rng.randint(0, 3))},
+        }
+        for i in range(n_items)
+    ]
+    recipes = [
+        {
+            "id": f"recipe{i}",
+            "product": {"id": rng.choice(items)["id"]},
+            "source_item": {"id": rng.choice(items)["id"]},
+            "principle": rng.choice(principles),
+            "principle_amount": rng.randint(1, 15),
+            "crafting_action": "craft",
+            "skills": [{"id": s["id"]} for s in rng.sample(skills, rng.randint(1, 3))],
+            "recipe_internals": [{"id": f"craft.recipe{i}.{j}"} for j in range(rng.randint(1, 3))],
+        }
+        for i in range(n_recipes)
+    ]
+    slots = [
+        {"id": f"Slot {i}", "name": f"Slot {i}", "index": i % 5, "accepts": [{"id": a} for a in rng.sample(aspects, 3)]} for i in range(60)
+    ]
+    workstations = [
+        {
+            "id": f"Workstation {i}",
+            "principles": rng.sample(principles, 3),
+            "workstation_type": {"id": "generic"},
+            "workstation_slots": [{"id": s["id"]} for s in rng.sample(slots, 5)],
+            "evolves": {"id": rng.choice(wisdoms)},
+        }
+        for i in range(40)
+    ]
+    return {"skill": skills, "item": items, "recipe": recipes, "workstation_slot": slots, "workstation": workstations}
+
+
+def write_catalogue(cache_dir: Path, **kwargs: Any) -> None:
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    for name, data in mk_catalogue(**kwargs).items():
+        (cache_dir / f"{name}.json").write_text(json.dumps(data))
@@ -1,4 +1,5 @@
 import logging
+import os
 import sys
 from asyncio.subprocess import create_subprocess_exec
 from functools import wraps
@@ -10,7 +11,7 @@ import typer
 from graphql import IntrospectionQuery, build_client_schema, get_introspection_query, print_schema
 from rich.logging import RichHandler
 
-from .settings import CACHE_DIR
+from .settings import CACHE_DIR, DB_INITIALIZED_ENV
 
 HERE = Path(__file__).parent
 
@@ -32,19 +33,70 @@ def run_async(func):
 def api(
     *,
     reload: Annotated[bool, typer.Option(envvar="DEBUG")] = False,
+    host: Annotated[str, typer.Option()] = "127.0.0.1",
+    port: Annotated[int, typer.Option()] = 8000,
+    workers: Annotated[int, typer.Option(min=1, help="Number of worker processes, ignored with --reload")] = 1,
 ) -> None:
     """Start the API server."""
     import uvicorn
 
+    if workers > 1 and not reload:
+        # initialize the database once, instead of in every worker
+        from sqlalchemy.orm import sessionmaker
+
+        from .database import get_engine, load_db
+
+        engine = get_engine()
+        load_db(engine, sessionmaker(autoflush=False, bind=engine))
+        os.environ[DB_INITIALIZED_ENV] = "1"
+
     uvicorn.run(
         "boh_app.server:app",
-        host="127.0.0.1",
-        port=8000,
+        host=host,
+        port=port,
         reload=reload,
+        workers=workers,
         use_colors=True,
     )
 
 
+@app.command()
+def startup_profile(
+    *,
+    cold: Annotated[bool, typer.Option(help="Start from a new database without snapshot")] = False,
+) -> None:
+    """Print how long importing and starting the API server takes, per phase.
+
+    Both modes start on a temporary database, the warm one from the snapshot, which is built first if it is missing.
+    """
+    from tempfile import TemporaryDirectory
+    from time import perf_counter
+
+    from .database import SNAPSHOT_PATH, build_snapshot, create_db_engine
+
+    start = perf_counter()
+    from .server import app as api_app
+    from .server import startup
+
+    import_time = perf_counter() - start
+    if not cold and not SNAPSHOT_PATH.is_file():
+        build_snapshot()
+    with TemporaryDirectory() as tmp_dir:
+        engine = create_db_engine(f"sqlite+pysqlite:///{tmp_dir}/db.sqlite")
+        try:
+            profile = startup(api_app, engine=engine, snapshot=None if cold else SNAPSHOT_PATH)
+        finally:
+            if executor := getattr(api_app.state, "graphql_executor", None):
+                executor.shutdown()
+            if (read_engine := getattr(api_app.state, "read_engine", engine)) is not engine:
+                read_engine.dispose()
+            engine.dispose()
+    phases = {"import": import_time, **profile.phases}
+    for name, duration in phases.items():
+        typer.echo(f"{name:<20}{duration * 1000:>10.1f} ms")
+    typer.echo(f"{'total':<20}{sum(phases.values()) * 1000:>10.1f} ms")
+
+
 @app.command()
 @run_async
 async def schema(
@@ -79,13 +131,48 @@ async def schema(
         await create_subprocess_exec(sys.executable, *args)
 
 
+@app.command()
+def gen_serializers(
+    *,
+    check: Annotated[bool, typer.Option(help="Only check that the generated module is up to date")] = False,
+) -> None:
+    """Generate `boh_app.serializers.generated` from the models,
+    so the server can import the pydantic models instead of reflecting."""
+    from .models import Base
+    from .serializers import reflect_pydantic_models
+    from .serializers.codegen import GENERATED_PATH, render_module
+
+    src = render_module(reflect_pydantic_models(Base))
+    if not check:
+        GENERATED_PATH.write_text(src)
+    elif not GENERATED_PATH.is_file() or GENERATED_PATH.read_text() != src:
+        typer.echo(f"{GENERATED_PATH} is out of date, run `boh_app gen-serializers`", err=True)
+        raise typer.Exit(1)
+
+
+@app.command()
+def gen_persisted_queries(
+    *,
+    check: Annotated[bool, typer.Option(help="Only check that the persisted queries are up to date")] = False,
+) -> None:
+    """Extract the frontend’s GraphQL documents into `boh_app/persisted_queries.json`,
+    so the server can parse them on startup and clients can send just their hash."""
+    from .persisted_queries import PERSISTED_QUERIES_PATH, extract_persisted_queries, render_persisted_queries
+
+    src = render_persisted_queries(extract_persisted_queries())
+    if not check:
+        PERSISTED_QUERIES_PATH.write_text(src)
+    elif not PERSISTED_QUERIES_PATH.is_file() or PERSISTED_QUERIES_PATH.read_text() != src:
+        typer.echo(f"{PERSISTED_QUERIES_PATH} is out of date, run `boh_app gen-persisted-queries`", err=True)
+        raise typer.Exit(1)
+
+
 @app.command()
 def empty_db() -> None:
     """Delete automatically generated database."""
-    from .database import DB_PATH
+    from .database import delete_db
 
-    if DB_PATH.is_file():
-        DB_PATH.unlink()
+    delete_db()
 
 
 @app.command()
@@ -126,7 +213,10 @@ def gen_recipes() -> None:
 
 
 @app.command()
-def gen_all() -> None:
+def gen_all(
+    *,
+    snapshot: Annotated[bool, typer.Option(help="Also build the database snapshot, see `build-db`")] = True,
+) -> None:
     """Generate all data. NB: Overwrites existing files and
     is not run by default during `boh_app.data.load_data.load_all`."""
     from .data.generate_items import gen_items_json
@@ -138,6 +228,17 @@ def gen_all() -> None:
     gen_skills_json()
     gen_workstation_json()
     gen_recipes_json()
+    if snapshot:
+        build_db()
+
+
+@app.command()
+def build_db() -> None:
+    """Build a fully loaded database snapshot from all data files.
+    `init_db` copies it into a new database instead of loading the data files."""
+    from .database import build_snapshot
+
+    build_snapshot()
 
 
 @app.command()
@@ -0,0 +1,100 @@
+"""
+In-process cache of encoded GET responses.
+
+Entries are keyed by URL and ETag, so a response is never served for table versions it wasn’t built from.
+Committed writes additionally evict the entries built from the written tables right away, instead of leaving them to the LRU.
+"""
+
+from collections import OrderedDict
+from collections.abc import Collection, Mapping
+from dataclasses import dataclass
+from threading import Lock
+from weakref import WeakSet
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .versions import CHANGED_TABLES_KEY
+
+_caches: WeakSet["ResponseCache"] = WeakSet()
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    headers: Mapping[str, str]
+    tables: frozenset[str]  # tables the response was built from
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(k) + len(v) for k, v in self.headers.items())
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+
+class ResponseCache:
+    """LRU cache of responses, bounded by the total size of their bodies and headers."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.stats = CacheStats()
+        self._entries: OrderedDict[tuple[str, ...], CachedResponse] = OrderedDict()
+        self._lock = Lock()  # sync endpoints run in a thread pool
+        _caches.add(self)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple[str, ...]) -> CachedResponse | None:
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry
+
+    def put(self, key: tuple[str, ...], entry: CachedResponse) -> CachedResponse:
+        if entry.size > self.max_bytes:
+            return entry
+        with self._lock:
+            if (old := self._entries.pop(key, None)) is not None:
+                self.size -= old.size
+            self._entries[key] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+                self.stats.evictions += 1
+        return entry
+
+    def invalidate(self, table_names: Collection[str]) -> None:
+        """Drop the entries built from any of `table_names`."""
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if not entry.tables.isdisjoint(table_names)]:
+                self.size -= self._entries.pop(key).size
+                self.stats.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    if table_names := session.info.pop(CHANGED_TABLES_KEY, None):
+        for cache in list(_caches):
+            cache.invalidate(table_names)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session: Session) -> None:
+    session.info.pop(CHANGED_TABLES_KEY, None)
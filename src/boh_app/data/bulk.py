@@ -0,0 +1,310 @@
+"""
+Bulk loading of data files through SQLAlchemy Core.
+
+Unlike `load_data.add_data`, this does not build ORM objects or look up related objects one at a time:
+a data file is validated in one pass, then its table and association tables are written with batched `executemany` statements.
+"""
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from functools import cache
+from typing import Any
+
+from pydantic import BaseModel, ConfigDict, TypeAdapter, ValidationError, create_model
+from pydantic_core import InitErrorDetails, PydanticCustomError
+from sqlalchemy import Column, Table, bindparam, case, delete, inspect, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import RelationshipDirection, RelationshipProperty, Session
+
+from ..models import Base, IdMixin
+from .types_sqla import JsonArray
+
+# SQLite allows 32,766 variables per statement since 3.32
+MAX_VARIABLES = 10_000
+
+row_config = ConfigDict(extra="forbid")
+ref_config = ConfigDict(extra="ignore")
+
+
+@dataclass
+class BulkResult:
+    tables: set[str]  # names of the tables written to
+    ids: list[Any]  # primary keys of the rows, in order
+    created: list[bool]  # whether each row was inserted rather than updated
+
+
+def bulk_load(data: Any, model: type[Base], *, session: Session, partial: bool = False) -> BulkResult:
+    """Upsert `data` into `model`’s table and the association tables of the relationships it contains.
+
+    With `partial`, rows for existing IDs only need to contain the columns to update.
+    """
+    rows: list[dict[str, Any]] = [row.model_dump(exclude_unset=True) for row in get_rows_adapter(model, partial).validate_python(data)]
+    mapper = inspect(model)
+    [pk] = mapper.primary_key
+    relationships: dict[str, RelationshipProperty] = {rel.key: rel for rel in mapper.relationships}
+    existing = get_existing(session, pk, [id_ for row in rows if (id_ := row.get(pk.key)) is not None])
+    created = get_created(rows, pk.key, existing)
+    if partial:
+        check_required(data, rows, created, model)
+    written = insert_referenced(session, model, rows)
+
+    records = []
+    for row in rows:
+        record = {key: value for key, value in row.items() if key not in relationships}
+        for key, value in row.items():
+            if (rel := relationships.get(key)) is not None and rel.direction is RelationshipDirection.MANYTOONE:
+                for local, remote in rel.local_remote_pairs:
+                    record[local.key] = None if value is None else value[remote.key]
+        records.append(record)
+    ids = upsert(session, model.__table__, records, existing=existing)
+
+    written.add(model.__table__.name)
+    for key, rel in relationships.items():
+        if rel.direction is RelationshipDirection.MANYTOONE:
+            continue
+        if not (owned := [(id_, row[key]) for id_, row in zip(ids, rows, strict=True) if key in row]):
+            continue
+        if rel.direction is RelationshipDirection.MANYTOMANY:
+            assert isinstance(rel.secondary, Table)
+            write_secondary(session, rel, owned)
+            written.add(rel.secondary.name)
+            if issubclass(rel.mapper.class_, IdMixin):
+                written.add(rel.mapper.local_table.name)  # missing values get inserted
+        else:
+            write_children(session, rel, owned)
+            written.add(rel.mapper.local_table.name)
+    return BulkResult(written, ids, created)
+
+
+def check_required(data: Any, rows: list[dict[str, Any]], created: list[bool], model: type[Base]) -> None:
+    """Raise a `ValidationError` for new rows that lack columns only existing rows may omit, or set them to null."""
+    required = get_required_keys(model)
+    errors = [
+        InitErrorDetails(type="missing", loc=(i, key), input=data[i])
+        for i, (row, is_new) in enumerate(zip(rows, created, strict=True))
+        if is_new
+        for key in required
+        if row.get(key) is None
+    ]
+    if errors:
+        raise ValidationError.from_exception_data(f"{model.__name__}BulkModel", errors)
+
+
+def insert_referenced(session: Session, model: type[Base], rows: list[dict[str, Any]]) -> set[str]:
+    """Insert the missing rows that `rows` refer to by ID, like marshmallow’s `Related` field does. Returns their tables.
+
+    References to missing rows that need more than an ID are reported as a `ValidationError` instead.
+    Missing children only need their ID and their parent, which `write_children` sets when it inserts them.
+    Value objects are inserted with their links, so they aren’t checked here.
+    """
+    written = set()
+    errors = []
+    for rel in inspect(model).relationships:
+        target: type[Base] = rel.mapper.class_
+        if issubclass(target, IdMixin):
+            continue
+        [target_pk] = rel.mapper.primary_key
+        settable = {target_pk.key}
+        if rel.direction is RelationshipDirection.ONETOMANY:
+            [(_, child_fk)] = rel.synchronize_pairs
+            settable |= {back.key for back in rel.mapper.relationships if child_fk in back.local_columns}
+        locs: dict[Any, list[tuple[int | str, ...]]] = {}
+        for i, row in enumerate(rows):
+            if (value := row.get(rel.key)) is None:
+                continue
+            for j, ref in enumerate(value) if rel.uselist else [(None, value)]:
+                locs.setdefault(ref[target_pk.key], []).append((i, rel.key) if j is None else (i, rel.key, j))
+        if not (missing := locs.keys() - get_existing(session, target_pk, list(locs))):
+            continue
+        if set(get_required_keys(target)) <= settable:
+            if rel.direction is not RelationshipDirection.ONETOMANY:
+                session.execute(insert(target.__table__), [{target_pk.key: id_} for id_ in missing])
+                written.add(target.__table__.name)
+            continue
+        for id_ in missing:
+            error = PydanticCustomError("missing_reference", "No {table} with ID {id}", {"table": target.__tablename__, "id": id_})
+            errors.extend(InitErrorDetails(type=error, loc=loc, input=id_) for loc in locs[id_])
+    if errors:
+        errors.sort(key=lambda error: error["loc"])
+        raise ValidationError.from_exception_data(f"{model.__name__}BulkModel", errors)
+    return written
+
+
+def upsert(session: Session, table: Table, records: Sequence[dict[str, Any]], *, existing: set[Any] | None = None) -> list[Any]:
+    """Insert or update `records` with one `executemany` each, returning their primary keys.
+
+    Like a marshmallow load, an existing row only gets the columns updated that its record contains.
+    A primary key repeated within `records` updates the row its first record inserts.
+    `existing` are the primary keys of `records` in `table`, if the caller already knows them.
+    """
+    [pk] = table.primary_key.columns
+    if existing is None:
+        existing = get_existing(session, pk, [id_ for record in records if (id_ := record.get(pk.key)) is not None])
+    created = get_created(records, pk.key, existing)
+    inserts = [record for record, is_new in zip(records, created, strict=True) if is_new]
+    updates = [record for record, is_new in zip(records, created, strict=True) if not is_new]
+
+    inserted_ids = []
+    if inserts:
+        keys = [col.key for col in table.columns if any(col.key in record for record in inserts)]
+        stmt = insert(table).values({key: bindparam(key) for key in keys}).returning(pk, sort_by_parameter_order=True)
+        params = [{key: record[key] if key in record else get_scalar_default(table.c[key]) for key in keys} for record in inserts]
+        inserted_ids = list(session.scalars(stmt, params))
+
+    if keys := [col.key for col in table.columns if col.key != pk.key and any(col.key in record for record in updates)]:
+        stmt = (
+            update(table)
+            .where(pk == bindparam("old_pk"))
+            .values({key: case((bindparam(f"provided_{key}"), bindparam(f"new_{key}")), else_=table.c[key]) for key in keys})
+        )
+        params = [
+            {
+                "old_pk": record[pk.key],
+                **{f"new_{key}": record.get(key) for key in keys},
+                **{f"provided_{key}": key in record for key in keys},
+            }
+            for record in updates
+        ]
+        session.execute(stmt, params)
+
+    new_ids = iter(inserted_ids)
+    return [next(new_ids) if is_new else record[pk.key] for record, is_new in zip(records, created, strict=True)]
+
+
+def get_existing(session: Session, pk: Column, ids: Sequence[Any]) -> set[Any]:
+    """The `ids` that are primary keys of `pk`’s table, looked up in chunks that stay below SQLite’s variable limit."""
+    existing: set[Any] = set()
+    for start in range(0, len(ids), MAX_VARIABLES):
+        existing.update(session.scalars(select(pk).where(pk.in_(ids[start : start + MAX_VARIABLES]))))
+    return existing
+
+
+def get_created(records: Sequence[dict[str, Any]], pk_key: str, existing: set[Any]) -> list[bool]:
+    """Whether each record inserts a row rather than updating one that exists or that an earlier record inserts."""
+    seen = set(existing)
+    created = []
+    for record in records:
+        id_ = record.get(pk_key)
+        created.append(id_ is None or id_ not in seen)
+        if id_ is not None:
+            seen.add(id_)
+    return created
+
+
+def get_scalar_default(col: Column) -> Any:
+    if col.default is not None and col.default.is_scalar:
+        return col.default.arg
+    return None
+
+
+def write_secondary(session: Session, rel: RelationshipProperty, owned: list[tuple[Any, list[dict[str, Any]]]]) -> None:
+    """Replace the association rows of the parents in `owned`."""
+    assert isinstance(rel.secondary, Table)
+    [(_, parent_link)] = rel.synchronize_pairs
+    [(target_col, target_link)] = rel.secondary_synchronize_pairs
+    target: type[Base] = rel.mapper.class_
+
+    session.execute(
+        delete(rel.secondary).where(parent_link == bindparam("parent_id")),
+        [{"parent_id": parent_id} for parent_id, _ in owned],
+    )
+    if issubclass(target, IdMixin):
+        target_ids = resolve_values(session, target, [ref for _, refs in owned for ref in refs])
+        links = {(parent_id, target_ids[value_key(ref)]) for parent_id, refs in owned for ref in refs}
+    else:
+        links = {(parent_id, ref[target_col.key]) for parent_id, refs in owned for ref in refs}
+    if links:
+        stmt = insert(rel.secondary).on_conflict_do_nothing()
+        session.execute(stmt, [{parent_link.key: parent_id, target_link.key: target_id} for parent_id, target_id in links])
+
+
+def write_children(session: Session, rel: RelationshipProperty, owned: list[tuple[Any, list[dict[str, Any]]]]) -> None:
+    """Upsert the children of a one-to-many relationship, pointing them at their parent.
+
+    Children that a parent’s list leaves out stay linked to it: their foreign key isn’t always nullable,
+    and unlinking them would mean deleting them. They are moved by listing them under another parent.
+    """
+    [(_, child_fk)] = rel.synchronize_pairs
+    records = [{**ref, child_fk.key: parent_id} for parent_id, refs in owned for ref in refs]
+    upsert(session, rel.mapper.local_table, records)
+
+
+def resolve_values(session: Session, model: type[Base], values: list[dict[str, Any]]) -> dict[tuple[Any, ...], int]:
+    """Map value objects of an `IdMixin` model to the IDs of matching rows, inserting missing rows."""
+    table: Table = model.__table__
+    cols = [table.c[key] for key in get_value_keys(model)]
+    ids = {tuple(row[1:]): row[0] for row in session.execute(select(table.c.id, *cols))}
+    if missing := {value_key(value): value for value in values if value_key(value) not in ids}:
+        inserted = session.execute(insert(table).returning(table.c.id, *cols), list(missing.values()))
+        ids.update({tuple(row[1:]): row[0] for row in inserted})
+    return ids
+
+
+def value_key(value: dict[str, Any]) -> tuple[Any, ...]:
+    return tuple(value[key] for key in sorted(value))
+
+
+@cache
+def get_value_keys(model: type[Base]) -> list[str]:
+    return sorted(get_ref_model(model).model_fields)
+
+
+@cache
+def get_required_keys(model: type[Base]) -> list[str]:
+    """Columns and many-to-one relationships that a new row needs."""
+    required = [key for key in get_column_fields(model) if is_required(model, model.__table__.c[key])]
+    for rel in inspect(model).relationships:
+        if rel.direction is RelationshipDirection.MANYTOONE and not all(col.nullable for col in rel.local_columns):
+            required.append(rel.key)
+    return required
+
+
+def get_column_fields(model: type[Base]) -> list[str]:
+    return [col.key for col in model.__table__.columns if not col.foreign_keys]  # FKs are set through relationships
+
+
+def is_required(model: type[Base], col: Column) -> bool:
+    is_generated = col.primary_key and issubclass(model, IdMixin)
+    return not (col.nullable or col.default is not None or is_generated)
+
+
+@cache
+def get_rows_adapter(model: type[Base], partial: bool = False) -> TypeAdapter[list[BaseModel]]:
+    """Adapter validating the whole content of a data file for `model`.
+
+    With `partial`, only primary keys are required. Columns and relationships that aren’t nullable can still not be null.
+    """
+    fields: dict[str, Any] = {}
+    for key in get_column_fields(model):
+        col = model.__table__.c[key]
+        python_type = get_column_type(col)
+        if is_required(model, col) and not (partial and not col.primary_key):
+            fields[col.key] = (python_type, ...)
+        else:  # may be omitted, but only be null if the column is nullable
+            fields[col.key] = (python_type | None if col.nullable else python_type, None)
+    for rel in inspect(model).relationships:
+        ref_model = get_ref_model(rel.mapper.class_)
+        if rel.uselist:
+            fields[rel.key] = (list[ref_model], None)
+        else:
+            fields[rel.key] = (ref_model | None if all(col.nullable for col in rel.local_columns) else ref_model, None)
+
+    row_model = create_model(f"{model.__name__}{'Partial' if partial else ''}BulkModel", __config__=row_config, **fields)
+    return TypeAdapter(list[row_model])
+
+
+@cache
+def get_ref_model(model: type[Base]) -> type[BaseModel]:
+    """Model for references to `model`: its primary key, or its values if it has a generated ID."""
+    if issubclass(model, IdMixin):
+        cols = [col for col in model.__table__.columns if not col.primary_key and not col.foreign_keys]
+    else:
+        cols = list(model.__table__.primary_key.columns)
+    fields: dict[str, Any] = {col.key: (get_column_type(col), ...) for col in cols}
+    return create_model(f"{model.__name__}RefModel", __config__=ref_config, **fields)
+
+
+def get_column_type(col: Column) -> Any:
+    if isinstance(col.type, JsonArray):
+        return list[col.type.item_type.python_type]
+    return col.type.python_type
@@ -1,12 +1,18 @@
 import json
 import logging
+from hashlib import sha256
 from pathlib import Path
 from typing import Any
 
+from sqlalchemy import Table, select
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateTable
 
-from ..models import Base, get_tablename_model_mapping
+from ..models import Base, data_manifest, get_tablename_model_mapping
 from ..settings import CACHE_DIR
+from ..versions import bump_versions
+from .bulk import bulk_load
 
 HERE = Path(__file__).parent
 
@@ -23,10 +29,9 @@ def add_data(data: Any, _class: type[Base], *, session: Session):
     # set transient=True to avoid warning when trying to get instance with id=None
     # i.e. with priniciple_count when UQ exists
     serializer = _class.__marshmallow__(many=True, transient=False)
-    with session.begin():
-        items = serializer.load(data, session=session)
-        for item in items:
-            session.add(item)
+    items = serializer.load(data, session=session)
+    for item in items:
+        session.add(item)
 
 
 def find_files():
@@ -35,14 +40,58 @@ def find_files():
     return {**here_file_paths, **cached_file_paths}
 
 
-def load_all(session: Session) -> None:
-    """Load sorted data into database."""
-    data_file_paths = find_files()
-    tablename2model = get_tablename_model_mapping()
+def get_table_digest(table: Table, file_digest: str) -> str:
+    """Digest of a data file’s content and the schema it gets loaded into."""
+    digest = sha256(file_digest.encode())
+    digest.update(str(CreateTable(table)).encode())
+    return digest.hexdigest()
+
+
+def get_manifest(session: Session) -> dict[str, str]:
+    """Map table names to the digest they were last loaded with."""
+    rows = session.execute(select(data_manifest.c.table_name, data_manifest.c.table_digest))
+    return dict(rows.tuples().all())
+
+
+def update_manifest(session: Session, *, table_name: str, path: Path, file_digest: str, table_digest: str) -> None:
+    values = {"path": str(path), "file_digest": file_digest, "table_digest": table_digest}
+    stmt = insert(data_manifest).values(table_name=table_name, **values)
+    session.execute(stmt.on_conflict_do_update(index_elements=[data_manifest.c.table_name], set_=values))
+
+
+def get_sorted_tables() -> list[Table]:
+    """Tables in the order their data needs to be loaded."""
     # add dependencies to ensure data are loaded in correct order
     Base.metadata.tables["recipe"].add_is_dependent_on(Base.metadata.tables["skill"])
     Base.metadata.tables["skill"].add_is_dependent_on(Base.metadata.tables["wisdom"])
-    for name in [t.fullname for t in Base.metadata.sorted_tables]:
-        if name in data_file_paths:
-            logging.info(f"Loading {name} data from {data_file_paths[name]}")
-            add_data(get_data(name), tablename2model[name], session=session)
+    return Base.metadata.sorted_tables
+
+
+def load_all(session: Session) -> list[str]:
+    """Load sorted data into database.
+
+    Tables whose data file and schema are unchanged since the last load are skipped.
+    Returns the names of the tables that were (re)loaded.
+    """
+    data_file_paths = find_files()
+    tablename2model = get_tablename_model_mapping()
+    with session.begin():
+        manifest = get_manifest(session)
+
+    loaded: list[str] = []
+    for table in get_sorted_tables():
+        if (path := data_file_paths.get(table.fullname)) is None:
+            continue
+        content = path.read_bytes()
+        file_digest = sha256(content).hexdigest()
+        table_digest = get_table_digest(table, file_digest)
+        if manifest.get(table.fullname) == table_digest:
+            logging.debug(f"Skipping unchanged {table.fullname} data from {path}")
+            continue
+        logging.info(f"Loading {table.fullname} data from {path}")
+        with session.begin():
+            result = bulk_load(json.loads(content), tablename2model[table.fullname], session=session)
+            bump_versions(session, result.tables)
+            update_manifest(session, table_name=table.fullname, path=path, file_digest=file_digest, table_digest=table_digest)
+        loaded.append(table.fullname)
+    return loaded
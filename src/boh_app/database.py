@@ -1,35 +1,224 @@
-from sqlalchemy import Engine, create_engine
+import logging
+import sqlite3
+from collections.abc import AsyncGenerator
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Literal, get_args
+
+from fastapi import Request
+from sqlalchemy import URL, Engine, create_engine, event, inspect
 from sqlalchemy.orm import Session, configure_mappers, sessionmaker
 
-from .data.load_data import load_all
 from .models import Base, get_tablename_model_mapping
-from .serializers import setup_schema
-from .settings import CACHE_DIR, DEBUG
+from .settings import (
+    CACHE_DIR,
+    DB_MAX_OVERFLOW,
+    DB_POOL_SIZE,
+    DEBUG,
+    SQLITE_BUSY_TIMEOUT,
+    SQLITE_CACHE_SIZE,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_MMAP_SIZE,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_TEMP_STORE,
+)
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 
 DB_PATH = CACHE_DIR / "db.sqlite"
+SNAPSHOT_PATH = CACHE_DIR / "snapshot.sqlite"
+
+# bound to `get_engine()` by `init_db`
+SessionLocal: sessionmaker[Session] = sessionmaker(autocommit=False, autoflush=False)
+
+
+JournalMode = Literal["DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"]
+Synchronous = Literal["OFF", "NORMAL", "FULL", "EXTRA"]
+TempStore = Literal["DEFAULT", "FILE", "MEMORY"]
+
+
+@dataclass(frozen=True)
+class StorageProfile:
+    """PRAGMAs applied to every new SQLite connection, and the size of the connection pool.
+
+    The defaults come from the ``BOH_APP_SQLITE_*`` and ``BOH_APP_DB_*`` environment variables, see `boh_app.settings`.
+    """
+
+    journal_mode: JournalMode = SQLITE_JOURNAL_MODE  # type: ignore[assignment]  # WAL: readers don’t block the writer
+    synchronous: Synchronous = SQLITE_SYNCHRONOUS  # type: ignore[assignment]  # NORMAL: with WAL, only the last commits can be lost
+    mmap_size: int = SQLITE_MMAP_SIZE  # bytes
+    cache_size: int = SQLITE_CACHE_SIZE  # negative: KiB, positive: pages
+    temp_store: TempStore = SQLITE_TEMP_STORE  # type: ignore[assignment]  # checked in `__post_init__`
+    busy_timeout: int = SQLITE_BUSY_TIMEOUT  # ms
+    query_only: bool = False  # reject writes, for connections that only serve reads
+    # FastAPI runs sync endpoints in a thread pool of 40 threads, most of which only read
+    pool_size: int = DB_POOL_SIZE
+    max_overflow: int = DB_MAX_OVERFLOW
+
+    def __post_init__(self) -> None:
+        # SQLite ignores unknown values
+        for name, values in [("journal_mode", JournalMode), ("synchronous", Synchronous), ("temp_store", TempStore)]:
+            if getattr(self, name) not in get_args(values):
+                raise ValueError(f"Invalid {name} {getattr(self, name)!r}, expected one of {', '.join(get_args(values))}")
+
+    def apply(self, dbapi_connection: sqlite3.Connection, _connection_record: Any = None) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in ["journal_mode", "synchronous", "mmap_size", "cache_size", "temp_store", "busy_timeout"]:
+                cursor.execute(f"PRAGMA {pragma} = {getattr(self, pragma)}")
+            if self.query_only:
+                cursor.execute("PRAGMA query_only = ON")
+        finally:
+            cursor.close()
+
+
+# as configured by the environment, used by `get_engine`
+DEFAULT_PROFILE = StorageProfile()
+# SQLite’s own defaults, for comparison
+SQLITE_DEFAULTS = StorageProfile(
+    journal_mode="DELETE", synchronous="FULL", mmap_size=0, cache_size=-2000, temp_store="DEFAULT", pool_size=5, max_overflow=10
+)
+
+
+def create_db_engine(url: str | URL, profile: StorageProfile = DEFAULT_PROFILE, **kw: Any) -> Engine:
+    """Create an engine for an SQLite file whose connections get `profile` applied."""
+    engine = create_engine(url, pool_size=profile.pool_size, max_overflow=profile.max_overflow, **kw)
+    event.listen(engine, "connect", profile.apply)
+    return engine
+
+
+def create_async_db_engine(engine: Engine, profile: StorageProfile = DEFAULT_PROFILE, **kw: Any) -> "AsyncEngine":
+    """Create an aiosqlite engine for the database file of `engine`."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = engine.url.set(drivername="sqlite+aiosqlite")
+    async_engine = create_async_engine(url, pool_size=profile.pool_size, max_overflow=profile.max_overflow, **kw)
+    event.listen(async_engine.sync_engine, "connect", profile.apply)
+    return async_engine
+
+
+@cache
+def get_engine() -> Engine:
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    return create_db_engine(f"sqlite+pysqlite:///{DB_PATH}", DEFAULT_PROFILE, echo=DEBUG)
+
+
+def build_snapshot(path: Path = SNAPSHOT_PATH) -> None:
+    """Write a fully loaded, analyzed and vacuumed database to `path`, for `init_db` to start from."""
+    from .data.load_data import load_all
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.unlink(missing_ok=True)
+    snapshot_engine = create_engine(f"sqlite+pysqlite:///{tmp_path}")
+    Base.metadata.create_all(bind=snapshot_engine)
+    with Session(snapshot_engine, autoflush=False) as session:
+        load_all(session)
+    with snapshot_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("ANALYZE")
+        conn.exec_driver_sql("VACUUM")
+    snapshot_engine.dispose()
+    tmp_path.replace(path)
+    logging.info(f"Wrote database snapshot to {path}")
 
-DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-engine = create_engine(f"sqlite+pysqlite:///{DB_PATH}", echo=DEBUG)
+def restore_snapshot(engine: Engine, path: Path = SNAPSHOT_PATH) -> bool:
+    """Copy the snapshot at `path` into the database if that is still empty."""
+    if not path.is_file() or inspect(engine).get_table_names():
+        return False
+    snapshot = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn = engine.raw_connection()
+    try:
+        snapshot.backup(conn.driver_connection)
+    finally:
+        conn.close()
+        snapshot.close()
+    logging.info(f"Restored database from snapshot {path}")
+    return True
+
+
+def db_lock(engine: Engine) -> AbstractContextManager[object]:
+    """Lock held while a process initializes the database file."""
+    from filelock import FileLock
+
+    if not engine.url.database or engine.url.database == ":memory:":
+        return nullcontext()
+    return FileLock(f"{engine.url.database}.lock")
+
+
+def delete_db(path: Path = DB_PATH) -> None:
+    """Delete the database file at `path`, with its WAL, shared memory and lock files.
+
+    A WAL file left over from a killed server would otherwise be replayed into the next database created at `path`.
+    """
+    for file in [path.with_name(f"{path.name}{suffix}") for suffix in ["-wal", "-shm", ".lock"]] + [path]:
+        file.unlink(missing_ok=True)
+
+
+def load_db(engine: Engine, mk_session: sessionmaker[Session], *, snapshot: Path | None = SNAPSHOT_PATH) -> list[str]:
+    """Create tables and load data. Returns the names of the tables that were (re)loaded.
+
+    Holds `db_lock`, so concurrently starting processes initialize the database one after the other.
+    """
+    from .data.load_data import load_all
+
+    with db_lock(engine):
+        if snapshot is not None:
+            restore_snapshot(engine, snapshot)  # load_all then only loads what changed since the snapshot was built
+        Base.metadata.create_all(bind=engine, checkfirst=True)
+        create_indexes(engine)
+        with mk_session() as session:
+            return load_all(session)
 
-SessionLocal: sessionmaker[Session] = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def create_indexes(engine: Engine) -> None:
+    """Add indexes that were declared after the tables were created, which `create_all` skips."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
-def init_db(engine: Engine = engine, mk_session: sessionmaker[Session] = SessionLocal) -> dict[str, type[Base]]:
-    Base.metadata.create_all(bind=engine, checkfirst=True)
+
+def init_db(
+    engine: Engine | None = None,
+    mk_session: sessionmaker[Session] = SessionLocal,
+    *,
+    snapshot: Path | None = SNAPSHOT_PATH,
+) -> dict[str, type[Base]]:
+    from .serializers import setup_schema
+
+    if engine is None:
+        engine = get_engine()
+    if mk_session.kw.get("bind") is None:
+        mk_session.configure(bind=engine)
     configure_mappers()
 
-    session = mk_session()
-    setup_schema(Base, session=session)  # depends on mappers being configured
-    load_all(session)  # depends on schema being setup
-    session.close()
+    with mk_session() as session:
+        setup_schema(Base, session=session)  # depends on mappers being configured
+    load_db(engine, mk_session, snapshot=snapshot)
 
     return get_tablename_model_mapping()
 
 
-def get_sess():
-    session = SessionLocal()
+def get_sess(request: Request):
+    session = request.app.state.mk_session()
     try:
         yield session
     finally:
         session.close()
+
+
+def get_read_sess(request: Request):
+    """Like `get_sess`, for endpoints that only read. Its connections may reject writes, see `startup`."""
+    session = request.app.state.mk_read_session()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+async def get_async_sess(request: Request) -> AsyncGenerator["AsyncSession", None]:
+    async with request.app.state.mk_async_session() as session:
+        yield session
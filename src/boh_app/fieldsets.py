@@ -0,0 +1,106 @@
+"""
+Sparse fieldsets for the REST endpoints: the `fields` and `expand` query parameters.
+
+Only the requested columns and relationships are loaded from the database,
+and responses are serialized with a pydantic model narrowed to them.
+"""
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from functools import lru_cache
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, TypeAdapter, create_model
+from sqlalchemy import inspect
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm.strategy_options import _AbstractLoad
+
+from .loading import get_relationship_loads, load_relationship
+from .models import HYBRID_DEPENDENCIES, Base
+from .versions import get_read_tables, get_relationship_tables
+
+FIELDS_DESCRIPTION = "Comma-separated columns to include. The ID is always included."
+EXPAND_DESCRIPTION = "Comma-separated relationships to include. Without `fields` and `expand`, all are included."
+
+
+@dataclass(frozen=True)
+class Fieldset:
+    model: type[Base]
+    fields: frozenset[str]  # columns and hybrid properties
+    expand: frozenset[str]  # relationships
+
+    @classmethod
+    def parse(cls, model: type[Base], fields: str | None, expand: str | None) -> "Fieldset | None":
+        """Check the query parameters against what `model.__pydantic__` serializes. `None` means everything."""
+        if fields is None and expand is None:
+            return None
+        relationships = inspect(model).relationships
+        serialized = model.__pydantic__.model_fields
+        scalars = {name for name in serialized if name not in relationships}
+        field_names = scalars if fields is None else split_names(fields)
+        expand_names = set() if expand is None else split_names(expand)
+        if unknown := field_names - scalars:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        if unknown := expand_names - (serialized.keys() - scalars):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown relationships: {', '.join(sorted(unknown))}")
+        pk_names = {col.key for col in inspect(model).primary_key}
+        return cls(model, frozenset(field_names | pk_names), frozenset(expand_names))
+
+    def get_hybrid_dependencies(self) -> set[str]:
+        """Names of the attributes that the requested hybrid properties read, as declared with `depends_on`."""
+        hybrids = [hybrid for name in self.fields if isinstance(hybrid := vars(self.model).get(name), hybrid_property)]
+        return {name for hybrid in hybrids for name in hybrid.info[HYBRID_DEPENDENCIES]}
+
+    def get_hidden_relationships(self) -> set[str]:
+        """Relationships that hybrid properties read, but that aren’t serialized themselves."""
+        return self.get_hybrid_dependencies().intersection(inspect(self.model).relationships.keys()) - self.expand
+
+    def get_loader_options(self) -> list[_AbstractLoad]:
+        mapper = inspect(self.model)
+        needed = self.fields | self.get_hybrid_dependencies()
+        columns = [getattr(self.model, col.key) for col in mapper.column_attrs if col.key in needed]
+        columns.extend(getattr(self.model, col.key) for name in self.expand for col in mapper.relationships[name].local_columns)
+        return [
+            load_only(*columns),
+            *get_relationship_loads(mapper, get_partial_model(self)),
+            *(load_relationship(mapper.relationships[name]) for name in self.get_hidden_relationships()),
+        ]
+
+    def get_tables(self) -> set[str]:
+        """Names of the tables whose content ends up in the response."""
+        mapper = inspect(self.model)
+        tables = get_read_tables(mapper, get_partial_model(self))
+        for name in self.get_hidden_relationships():
+            tables |= get_relationship_tables(mapper, name)
+        return tables
+
+
+def get_pydantic_model(model: type[Base], fieldset: Fieldset | None) -> type[BaseModel]:
+    return model.__pydantic__ if fieldset is None else get_partial_model(fieldset)
+
+
+def dump_json(model: type[Base], fieldset: Fieldset | None, data: Base | Iterable[Base]) -> bytes:
+    """Serialize a row or a list of rows with `model.__pydantic__`, or narrowed to `fieldset`."""
+    pydantic_model = get_pydantic_model(model, fieldset)
+    if isinstance(data, Base):
+        return pydantic_model.model_validate(data).model_dump_json().encode()
+    adapter = get_list_adapter(pydantic_model)
+    return adapter.dump_json(adapter.validate_python(list(data), from_attributes=True))
+
+
+def split_names(names: str) -> set[str]:
+    return {name.strip() for name in names.split(",") if name.strip()}
+
+
+@lru_cache(maxsize=256)
+def get_partial_model(fieldset: Fieldset) -> type[BaseModel]:
+    full_model = fieldset.model.__pydantic__
+    names = fieldset.fields | fieldset.expand
+    fields = {name: (field.annotation, field) for name, field in full_model.model_fields.items() if name in names}
+    return create_model(f"{full_model.__name__}Partial", __config__=full_model.model_config, **fields)
+
+
+@lru_cache(maxsize=256)
+def get_list_adapter(partial_model: type[BaseModel]) -> TypeAdapter[list[BaseModel]]:
+    return TypeAdapter(list[partial_model])
@@ -0,0 +1,128 @@
+"""
+Filters for the REST collections, compiled to SQL.
+
+Query parameters that the endpoint doesn’t otherwise use are filters. Repeating one matches any of its values.
+
+- ``<column>=<value>``, e.g. ``known=true``
+- ``<column>__gt``, ``__gte``, ``__lt`` and ``__lte`` for numeric columns, e.g. ``lantern__gte=2``
+- ``<table>=<id>`` for rows related to one of those rows of another table, e.g. ``aspect=tool&aspect=memory``
+- ``principle=<principle>`` for rows with one of those principles, however the model stores them
+"""
+
+import operator
+from collections.abc import Callable, Collection, Sequence
+from dataclasses import dataclass, field
+from functools import cache
+
+from fastapi import HTTPException, status
+from sqlalchemy import ColumnElement, Integer, exists, func, inspect, or_
+from sqlalchemy.orm import Mapper
+from starlette.datastructures import QueryParams
+
+from .data.types import Principle
+from .data.types_sqla import JsonArray
+from .models import Base
+from .versions import get_relationship_tables
+
+FILTERS_DESCRIPTION = (
+    "Other query parameters filter the rows: `<column>=<value>`, `<column>__gte=<number>` (also `__gt`, `__lt`, `__lte`), "
+    "`<table>=<id>` for related rows and `principle=<principle>`. Repeat a parameter to match any of its values."
+)
+
+COMPARISONS: dict[str, Callable[[ColumnElement, object], ColumnElement[bool]]] = {
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+
+PRINCIPLE_FILTER = "principle"
+
+
+@dataclass
+class Filters:
+    clauses: list[ColumnElement[bool]] = field(default_factory=list)
+    tables: set[str] = field(default_factory=set)  # tables read by the clauses, besides the model’s own
+
+    @classmethod
+    def parse(cls, model: type[Base], params: QueryParams, exclude: Collection[str]) -> "Filters":
+        """Compile the parameters in `params` that aren’t in `exclude` to `WHERE` clauses on `model`."""
+        filters = cls()
+        unknown = []
+        for name in dict.fromkeys(params.keys()):
+            if name in exclude:
+                continue
+            values = params.getlist(name)
+            if (clause := filters.compile(model, name, values)) is None:
+                unknown.append(name)
+            else:
+                filters.clauses.append(clause)
+        if unknown:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown filters: {', '.join(sorted(unknown))}")
+        return filters
+
+    def compile(self, model: type[Base], name: str, values: Sequence[str]) -> ColumnElement[bool] | None:
+        mapper = inspect(model)
+        column_name, _, op = name.partition("__")
+        if (column := get_filter_columns(mapper).get(column_name)) is None:
+            if op:
+                return None
+            if (rel_name := get_relationship_filters(mapper).get(name)) is not None:
+                self.tables |= get_relationship_tables(mapper, rel_name)
+                rel = mapper.relationships[rel_name]
+                [target_pk] = rel.mapper.primary_key
+                ids = [parse_value(name, target_pk.type.python_type, value) for value in values]
+                return getattr(model, rel_name).any(target_pk.in_(ids))
+            if name == PRINCIPLE_FILTER and (principle_filter := get_principle_filter(mapper)) is not None:
+                return principle_filter([parse_value(name, Principle, value) for value in values])
+            return None
+        attr = getattr(model, column.key)
+        parsed = [parse_value(name, column.type.python_type, value) for value in values]
+        if not op:
+            return attr.in_(parsed)
+        if op not in COMPARISONS or not isinstance(column.type, Integer):
+            return None
+        return or_(*(COMPARISONS[op](attr, value) for value in parsed))
+
+
+@cache
+def get_filter_columns(mapper: Mapper) -> dict[str, ColumnElement]:
+    """Columns that can be compared to a single query parameter value."""
+    return {col.key: col.columns[0] for col in mapper.column_attrs if not isinstance(col.columns[0].type, JsonArray)}
+
+
+@cache
+def get_relationship_filters(mapper: Mapper) -> dict[str, str]:
+    """Names of the collection relationships by the table they lead to, where that table is reached through only one of them."""
+    by_table: dict[str, list[str]] = {}
+    for rel in mapper.relationships:
+        if rel.uselist:
+            by_table.setdefault(rel.mapper.local_table.name, []).append(rel.key)
+    return {table: rel_names[0] for table, rel_names in by_table.items() if len(rel_names) == 1 and table not in get_filter_columns(mapper)}
+
+
+def get_principle_filter(mapper: Mapper) -> Callable[[list[Principle]], ColumnElement[bool]] | None:
+    """How to match rows having one of some principles, for models that don’t have a single `principle` column."""
+    model = mapper.class_
+    columns = mapper.columns
+    if all(principle.value in columns for principle in Principle):  # an amount per principle
+        return lambda principles: or_(*(getattr(model, principle.value) > 0 for principle in principles))
+    if "primary_principle" in columns and "secondary_principle" in columns:
+        return lambda principles: or_(model.primary_principle.in_(principles), model.secondary_principle.in_(principles))
+    if "principles" in columns and isinstance(columns["principles"].type, JsonArray):
+
+        def json_contains(principles: list[Principle]) -> ColumnElement[bool]:
+            elements = func.json_each(model.principles).table_valued("value")
+            return exists().select_from(elements).where(elements.c.value.in_([principle.name for principle in principles]))
+
+        return json_contains
+    return None
+
+
+def parse_value(name: str, typ: type, value: str) -> object:
+    try:
+        if typ is bool:
+            return {"true": True, "false": False}[value.lower()]
+        return typ(value)
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid value for {name}: {value!r}") from None
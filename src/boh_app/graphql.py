@@ -1,5 +1,247 @@
+"""
+The GraphQL schema, with relationships loaded in batches.
+
+graphql-sqlalchemy resolves relationship fields by reading the attribute, which lazy-loads it one parent object at a time.
+Here, the first time a relationship is resolved, it is loaded for all objects of that model the operation has returned so far,
+with one `SELECT … IN` per relationship. The number of statements then depends on the depth of a query, not its result.
+
+Each operation gets its own context, with the session `handle_graphql_query` opens for the request,
+or with one opened for the operation if it comes over a WebSocket.
+Operations are executed on a bounded thread pool, since the resolvers block on the database.
+Query results can be cached, see `graphql_cache`, and operations are limited by their cost, see `graphql_cost`.
+"""
+
+import asyncio
+import json
+from collections.abc import Callable, Iterable
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from functools import cache, partial
+from typing import Any
+
+from ariadne import graphql_sync
+from ariadne.asgi.handlers import GraphQLHTTPHandler
+from ariadne.graphql import handle_graphql_errors
+from ariadne.types import GraphQLResult
+from graphql import DocumentNode, GraphQLError, GraphQLResolveInfo, GraphQLSchema, parse
 from graphql_sqlalchemy import build_schema
+from graphql_sqlalchemy.names import get_model_pk_field_name, get_table_name
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import RelationshipDirection, RelationshipProperty, Session
+from sqlalchemy.orm.attributes import set_committed_value
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.websockets import WebSocket
+
+from .cache import CachedResponse, ResponseCache
+from .graphql_cache import get_cacheable_operation
+from .graphql_cost import CostEstimator
+from .models import Base, get_tablename_model_mapping
+from .persisted_queries import DocumentCache
+from .versions import get_versions
+
+# key in the GraphQL context for the `RelationshipLoader` of an operation
+LOADER_KEY = "relationship_loader"
+# key in the GraphQL context that is set if the session was opened for the operation, and is closed with it
+OWN_SESSION_KEY = "own_session"
+
+
+class RelationshipLoader:
+    """Loads relationships for all objects returned within one GraphQL operation."""
+
+    def __init__(self, session: Session) -> None:
+        self.session = session
+        self.seen: dict[type[Base], dict[int, Base]] = {}  # by model and `id()`
+
+    def add(self, result: Base | Iterable[Base] | None) -> None:
+        """Remember the objects a resolver returned, as parents for the next level of the query."""
+        for obj in [result] if isinstance(result, Base) or result is None else result:
+            if obj is not None:
+                self.seen.setdefault(type(obj), {})[id(obj)] = obj
+
+    def get(self, obj: Base, rel: RelationshipProperty) -> Any:
+        if rel.key not in inspect(obj).dict:  # not loaded yet
+            self.add(obj)
+            parents = [parent for parent in self.seen[type(obj)].values() if rel.key not in inspect(parent).dict]
+            load_relationship(self.session, rel, parents)
+            for parent in parents:  # the next level is resolved one parent at a time, but should be loaded for all of them
+                self.add(getattr(parent, rel.key))
+        value = getattr(obj, rel.key)
+        self.add(value)
+        return value
+
+
+def load_relationship(session: Session, rel: RelationshipProperty, parents: list[Base]) -> None:
+    """Load `rel` for all `parents` with one query, and set it on them without marking them as changed."""
+    target = rel.mapper.class_
+    if rel.direction is RelationshipDirection.MANYTOONE:
+        [(target_col, local_col)] = rel.synchronize_pairs
+        local_key = rel.parent.get_property_by_column(local_col).key
+        target_key = rel.mapper.get_property_by_column(target_col).key
+        ids = {id_ for parent in parents if (id_ := getattr(parent, local_key)) is not None}
+        by_id = {getattr(obj, target_key): obj for obj in session.scalars(select(target).where(target_col.in_(ids)))}
+        for parent in parents:
+            set_committed_value(parent, rel.key, by_id.get(getattr(parent, local_key)))
+        return
+
+    [(parent_col, link_col)] = rel.synchronize_pairs
+    parent_key = rel.parent.get_property_by_column(parent_col).key
+    ids = {getattr(parent, parent_key) for parent in parents}
+    if rel.direction is RelationshipDirection.MANYTOMANY:  # through the association table
+        stmt = select(link_col, target).select_from(target).join(rel.secondary, rel.secondaryjoin).where(link_col.in_(ids))
+    else:
+        link_key = rel.mapper.get_property_by_column(link_col).key
+        stmt = select(getattr(target, link_key), target).where(link_col.in_(ids))
+    children: dict[Any, list[Base]] = {}
+    for parent_id, child in session.execute(stmt).tuples():
+        children.setdefault(parent_id, []).append(child)
+    for parent in parents:
+        set_committed_value(parent, rel.key, children.get(getattr(parent, parent_key), []))
+
+
+def get_context(session: Session) -> dict[str, Any]:
+    """Context for one GraphQL operation."""
+    return {"session": session, LOADER_KEY: RelationshipLoader(session)}
+
+
+def get_request_context(request: Request | WebSocket, _data: Any) -> dict[str, Any]:
+    """Context for the operation in a request, using the request’s session.
+
+    Operations over a WebSocket have no request session. They get one of their own, which the handler closes afterwards.
+    """
+    if (session := request.scope.get("db")) is not None:
+        return get_context(session)
+    return {**get_context(request.app.state.mk_session()), OWN_SESSION_KEY: True}
+
+
+@dataclass(frozen=True)
+class EncodedResult:
+    """A successful result, already encoded as JSON."""
+
+    body: bytes
+
+
+class ThreadedGraphQLHTTPHandler(GraphQLHTTPHandler):
+    """HTTP handler that executes operations on `executor` instead of the event loop.
+
+    If `documents` is given, requests can refer to its persisted queries by hash.
+    If `results` is given, query results are cached in it.
+    If `costs` is given, successful results report their estimated cost in `extensions.cost`.
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        documents: DocumentCache | None = None,
+        results: ResponseCache | None = None,
+        costs: CostEstimator | None = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.executor = executor
+        self.documents = documents
+        self.results = results
+        self.costs = costs
+
+    async def execute_graphql_query(
+        self, request: Any, data: Any, *, context_value: Any = None, query_document: DocumentNode | None = None
+    ) -> GraphQLResult:
+        if self.documents is not None:
+            try:
+                data = self.documents.resolve(data)
+            except GraphQLError as error:
+                return handle_graphql_errors([error], logger=self.logger, error_formatter=self.error_formatter, debug=self.debug)
+        if context_value is None:
+            context_value = await self.get_context_for_request(request, data)
+        if self.schema is None:
+            raise TypeError("schema is not set, call configure method to initialize it")
+        execute = partial(
+            self.execute_sync,
+            self.schema,
+            data,
+            context_value=context_value,
+            root_value=self.root_value,
+            query_parser=self.query_parser,
+            query_validator=self.query_validator,
+            query_document=query_document,
+            validation_rules=self.validation_rules,
+            require_query=isinstance(request, Request) and request.method == "GET",
+            debug=self.debug,
+            introspection=self.introspection,
+            logger=self.logger,
+            error_formatter=self.error_formatter,
+            extensions=await self.get_extensions_for_request(request, context_value),
+            middleware=await self.get_middleware_for_request(request, context_value),
+            middleware_manager_class=self.middleware_manager_class,
+            execution_context_class=self.execution_context_class,
+        )
+        try:
+            success, result = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.execute_cached, execute, data, context_value
+            )
+        finally:
+            if context_value.get(OWN_SESSION_KEY):
+                context_value["session"].close()
+        if isinstance(request, WebSocket) and isinstance(result, EncodedResult):  # the WebSocket handler encodes its messages itself
+            result = json.loads(result.body)
+        return success, result
+
+    def execute_sync(self, schema: GraphQLSchema, data: Any, **kwargs: Any) -> GraphQLResult:
+        success, result = graphql_sync(schema, data, **kwargs)
+        if success and self.costs is not None:
+            if (document := kwargs["query_document"]) is None:
+                document = parse(data["query"]) if self.query_parser is None else self.query_parser(kwargs["context_value"], data)
+            if (estimate := self.costs.estimate(document, data.get("operationName"))) is not None:
+                result.setdefault("extensions", {})["cost"] = estimate.cost
+        return success, result
+
+    def execute_cached(self, execute: Callable[[], GraphQLResult], data: Any, context_value: Any) -> Any:
+        """Run `execute`, unless the result of the same query on the same table versions is cached."""
+        query = data.get("query") if isinstance(data, dict) else None
+        if self.results is None or not isinstance(query, str):
+            return execute()
+        if (operation := get_cacheable_operation(query, data.get("operationName"))) is None:
+            return execute()
+        with context_value["session"].begin():  # read the versions and the result in one transaction
+            key = operation.get_key(data, get_versions(context_value["session"], operation.tables))
+            if (cached := self.results.get(key)) is None:
+                success, result = execute()
+                if not success or "errors" in result:
+                    return success, result
+                cached = self.results.put(key, CachedResponse(JSONResponse(result).body, {}, operation.tables))
+        return True, EncodedResult(cached.body)
+
+    async def create_json_response(self, request: Any, result: Any, success: bool) -> Response:
+        if isinstance(result, EncodedResult):
+            return Response(result.body, media_type="application/json")
+        return await super().create_json_response(request, result, success)
+
+
+def make_relationship_resolver(rel: RelationshipProperty) -> Callable[..., Any]:
+    def resolver(root: Base, info: GraphQLResolveInfo) -> Any:
+        return info.context[LOADER_KEY].get(root, rel)
+
+    return resolver
+
+
+def make_root_resolver(resolve: Callable[..., Any]) -> Callable[..., Any]:
+    def resolver(root: None, info: GraphQLResolveInfo, **kwargs: Any) -> Any:
+        result = resolve(root, info, **kwargs)
+        info.context[LOADER_KEY].add(result)
+        return result
+
+    return resolver
 
-from .models import Base
 
-gql_schema = build_schema(Base)
+@cache
+def get_gql_schema() -> GraphQLSchema:
+    schema = build_schema(Base)
+    for model in get_tablename_model_mapping().values():
+        type_name = get_table_name(model)
+        object_type = schema.type_map[type_name]
+        for name, rel in inspect(model).relationships.items():
+            object_type.fields[name].resolve = make_relationship_resolver(rel)
+        for field_name in (type_name, get_model_pk_field_name(model)):
+            if (field := schema.query_type.fields.get(field_name)) is not None:
+                field.resolve = make_root_resolver(field.resolve)
+    return schema
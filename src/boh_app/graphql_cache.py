@@ -0,0 +1,171 @@
+"""
+Caching of encoded GraphQL query results.
+
+The tables a query reads are derived from its document: the table of each root field, and those of the relationships
+that its selection set, `where` and `order` arguments follow. Results are cached in a `ResponseCache`, keyed by the hash of
+the printed document, the variables, the operation name and the versions of those tables. Like the REST responses,
+they are evicted as soon as a write to one of the tables is committed.
+"""
+
+import json
+from collections.abc import Mapping
+from dataclasses import dataclass
+from functools import cache, lru_cache
+from typing import Any
+
+from graphql import (
+    DocumentNode,
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    InlineFragmentNode,
+    ListValueNode,
+    ObjectValueNode,
+    OperationType,
+    SelectionSetNode,
+    ValueNode,
+    VariableNode,
+    get_operation_ast,
+    parse,
+    print_ast,
+)
+from graphql_sqlalchemy.names import get_model_pk_field_name, get_table_name
+from sqlalchemy import inspect
+from sqlalchemy.orm import Mapper
+
+from .models import Base, get_tablename_model_mapping
+from .persisted_queries import get_query_hash
+from .settings import GRAPHQL_DOCUMENT_CACHE_SIZE
+from .versions import get_etag, get_relationship_tables
+
+# arguments of the root fields whose keys can follow relationships
+RELATIONSHIP_ARGUMENTS = frozenset({"where", "order"})
+BOOL_OPERATORS = frozenset({"_and", "_or", "_not"})
+
+
+class NotCacheable(Exception):
+    """The tables an operation reads can’t be derived from its document."""
+
+
+@dataclass(frozen=True)
+class CacheableOperation:
+    document_hash: str
+    tables: frozenset[str]
+
+    def get_key(self, data: Mapping[str, Any], versions: dict[str, int]) -> tuple[str, ...]:
+        variables = json.dumps(data.get("variables") or {}, sort_keys=True)
+        return (self.document_hash, data.get("operationName") or "", variables, get_etag(versions))
+
+
+@lru_cache(maxsize=GRAPHQL_DOCUMENT_CACHE_SIZE)
+def get_cacheable_operation(query: str, operation_name: str | None) -> CacheableOperation | None:
+    """The cache key parts of a query, or `None` for other operations and queries whose tables aren’t known."""
+    try:
+        document = parse(query)
+        tables = get_operation_tables(document, operation_name)
+    except (GraphQLError, NotCacheable):
+        return None
+    return CacheableOperation(get_query_hash(print_ast(document)), tables)
+
+
+def get_operation_tables(document: DocumentNode, operation_name: str | None) -> frozenset[str]:
+    """Names of the tables that a query reads."""
+    operation = get_operation_ast(document, operation_name)
+    if operation is None or operation.operation is not OperationType.QUERY:
+        raise NotCacheable
+    fragments = get_fragments(document)
+    tables: set[str] = set()
+    for field in iter_fields(operation.selection_set, fragments):
+        if field.name.value.startswith("__"):  # introspection only reads the schema
+            continue
+        if (model := get_root_field_models().get(field.name.value)) is None:
+            raise NotCacheable
+        mapper = inspect(model)
+        tables |= get_selection_tables(mapper, field.selection_set, fragments)
+        for argument in field.arguments:
+            if argument.name.value in RELATIONSHIP_ARGUMENTS:
+                tables |= get_argument_tables(mapper, argument.value)
+    return frozenset(tables)
+
+
+@cache
+def get_root_field_models() -> dict[str, type[Base]]:
+    return {
+        name: model for model in get_tablename_model_mapping().values() for name in (get_table_name(model), get_model_pk_field_name(model))
+    }
+
+
+def get_fragments(document: DocumentNode) -> dict[str, FragmentDefinitionNode]:
+    """Fragment definitions by name.
+
+    Raises `NotCacheable` if they spread each other in a cycle, which validation reports, so that expanding them ends.
+    """
+    fragments = {definition.name.value: definition for definition in document.definitions if isinstance(definition, FragmentDefinitionNode)}
+    # a cycle can go through nested fields, so drop the fragments that spread no remaining ones until none are left
+    remaining = {name: get_spread_names(fragment.selection_set) & fragments.keys() for name, fragment in fragments.items()}
+    while remaining:
+        if not (leaves := [name for name, spread in remaining.items() if not spread & remaining.keys()]):
+            raise NotCacheable
+        for name in leaves:
+            del remaining[name]
+    return fragments
+
+
+def get_spread_names(selection_set: SelectionSetNode) -> set[str]:
+    """Names of the fragments spread anywhere in `selection_set`."""
+    names = set()
+    selection_sets = [selection_set]
+    while selection_sets:
+        for selection in selection_sets.pop().selections:
+            if isinstance(selection, FragmentSpreadNode):
+                names.add(selection.name.value)
+            elif selection.selection_set is not None:
+                selection_sets.append(selection.selection_set)
+    return names
+
+
+def iter_fields(selection_set: SelectionSetNode | None, fragments: Mapping[str, FragmentDefinitionNode]) -> list[FieldNode]:
+    """Fields of `selection_set`, with fragments expanded. `fragments` must be acyclic, as `get_fragments` ensures."""
+    if selection_set is None:
+        return []
+    fields = []
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            fields.append(selection)
+        elif isinstance(selection, InlineFragmentNode):
+            fields.extend(iter_fields(selection.selection_set, fragments))
+        elif isinstance(selection, FragmentSpreadNode):
+            if (fragment := fragments.get(selection.name.value)) is None:
+                raise NotCacheable
+            fields.extend(iter_fields(fragment.selection_set, fragments))
+    return fields
+
+
+def get_selection_tables(
+    mapper: Mapper, selection_set: SelectionSetNode | None, fragments: Mapping[str, FragmentDefinitionNode]
+) -> set[str]:
+    tables = {mapper.local_table.name}
+    for field in iter_fields(selection_set, fragments):
+        if (rel := mapper.relationships.get(field.name.value)) is not None:
+            tables |= get_relationship_tables(mapper, rel.key)
+            tables |= get_selection_tables(rel.mapper, field.selection_set, fragments)
+    return tables
+
+
+def get_argument_tables(mapper: Mapper, value: ValueNode) -> set[str]:
+    """Tables that the relationships in a `where` or `order` argument lead to."""
+    if isinstance(value, VariableNode):  # could follow any relationship
+        raise NotCacheable
+    if isinstance(value, ListValueNode):
+        return set().union(*(get_argument_tables(mapper, item) for item in value.values))
+    tables: set[str] = set()
+    if isinstance(value, ObjectValueNode):
+        for field in value.fields:
+            name = field.name.value
+            if name in BOOL_OPERATORS:
+                tables |= get_argument_tables(mapper, field.value)
+            elif (rel := mapper.relationships.get(name)) is not None:
+                tables |= get_relationship_tables(mapper, name)
+                tables |= get_argument_tables(rel.mapper, field.value)
+    return tables
@@ -0,0 +1,200 @@
+"""
+Static cost analysis for GraphQL operations.
+
+The schema exposes every relationship in both directions, so a small document can resolve a huge number of objects.
+The cost of an operation is the number of objects it is estimated to resolve: the rows of each root field's table
+(or its literal `limit`), multiplied along each relationship by the average number of related rows per row.
+Those statistics are read from the database on first use, and again when the table versions change.
+Operations deeper or costlier than the configured maximums fail validation.
+Introspection fields are neither counted nor limited, as they only read the schema.
+"""
+
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from threading import Lock
+from time import monotonic
+
+from graphql import (
+    DocumentNode,
+    FieldNode,
+    FragmentDefinitionNode,
+    GraphQLError,
+    IntValueNode,
+    OperationDefinitionNode,
+    SelectionSetNode,
+    ValidationRule,
+    get_operation_ast,
+)
+from sqlalchemy import func, inspect, select
+from sqlalchemy.orm import Mapper, RelationshipDirection, RelationshipProperty, Session
+
+from .graphql_cache import NotCacheable, get_fragments, get_root_field_models, iter_fields
+from .models import Base, get_tablename_model_mapping
+from .settings import GRAPHQL_COST_STATS_TTL
+from .versions import get_versions
+
+# attribute keeping an operation’s cost on its `OperationDefinitionNode`, with the statistics it was estimated from.
+# Not a `WeakKeyDictionary`: AST nodes hash and compare by structure, so equal operations would share an entry
+# even when their documents define different fragments, and each lookup would compare the nodes recursively.
+COST_ATTR = "_boh_app_cost"
+
+
+@dataclass(frozen=True)
+class OperationCost:
+    depth: int
+    cost: int
+
+
+@dataclass(frozen=True)
+class TableStats:
+    rows: dict[Mapper, int]
+    fanouts: dict[RelationshipProperty, float]  # related rows per row
+    versions: dict[str, int]  # of the tables when the statistics were read
+
+    @classmethod
+    def load(cls, session: Session) -> "TableStats":
+        """Count the rows of each model and the links of each relationship."""
+        mappers = [inspect(model) for model in get_tablename_model_mapping().values()]
+        rows = {mapper: session.scalar(select(func.count()).select_from(mapper.local_table)) or 0 for mapper in mappers}
+        fanouts = {rel: count_links(session, rel) / max(rows[mapper], 1) for mapper in mappers for rel in mapper.relationships}
+        return cls(rows, fanouts, get_versions(session, Base.metadata.tables.keys()))
+
+
+class CostEstimator:
+    """Estimates operation costs from `TableStats`, which are reloaded when a table version changed.
+
+    The versions are checked at most every `ttl` seconds. Commits of other processes don’t fire this one’s events.
+    """
+
+    def __init__(self, mk_session: Callable[[], Session], *, ttl: float = GRAPHQL_COST_STATS_TTL) -> None:
+        self.mk_session = mk_session
+        self.ttl = ttl
+        self._stats: TableStats | None = None
+        self._checked = 0.0
+        self._lock = Lock()  # operations are validated in a thread pool
+
+    @property
+    def stats(self) -> TableStats:
+        stats = self._stats
+        if stats is None or monotonic() - self._checked >= self.ttl:
+            with self._lock:
+                if (stats := self._stats) is None or monotonic() - self._checked >= self.ttl:
+                    stats = self._stats = self.load_stats(stats)
+                    self._checked = monotonic()
+        return stats
+
+    def load_stats(self, stats: TableStats | None) -> TableStats:
+        """`stats` if the table versions are still the same, or new statistics."""
+        with self.mk_session() as session, session.begin():
+            if stats is not None and get_versions(session, Base.metadata.tables.keys()) == stats.versions:
+                return stats
+            return TableStats.load(session)
+
+    def estimate(self, document: DocumentNode, operation_name: str | None) -> OperationCost | None:
+        if (operation := get_operation_ast(document, operation_name)) is None:
+            return None
+        return self.get_cost(document, operation)
+
+    def get_cost(self, document: DocumentNode, operation: OperationDefinitionNode) -> OperationCost:
+        """The cost of `operation`, kept on it until the statistics change, so validation and execution estimate it once."""
+        stats = self.stats
+        memo: tuple[TableStats, OperationCost] | None = getattr(operation, COST_ATTR, None)
+        if memo is None or memo[0] is not stats:
+            memo = (stats, self.estimate_operation(operation, get_fragments(document), stats))
+            setattr(operation, COST_ATTR, memo)
+        return memo[1]
+
+    def estimate_operation(
+        self, operation: OperationDefinitionNode, fragments: Mapping[str, FragmentDefinitionNode], stats: TableStats
+    ) -> OperationCost:
+        depth = cost = 0
+        for root in iter_fields(operation.selection_set, fragments):
+            if root.name.value.startswith("__"):
+                continue
+            mapper = None if (model := get_root_field_models().get(root.name.value)) is None else inspect(model)
+            rows = 1 if mapper is None or root.name.value.endswith("_by_pk") else stats.rows.get(mapper, 0)
+            if (limit := get_argument(root, "limit")) is not None:
+                rows = min(rows, limit)
+            field_depth, field_cost = self.estimate_selection(stats, mapper, root.selection_set, rows, fragments)
+            depth = max(depth, 1 + field_depth)
+            cost += rows + field_cost
+        return OperationCost(depth, round(cost))
+
+    def estimate_selection(
+        self,
+        stats: TableStats,
+        mapper: Mapper | None,
+        selection_set: SelectionSetNode | None,
+        rows: float,
+        fragments: Mapping[str, FragmentDefinitionNode],
+    ) -> tuple[int, float]:
+        """Depth and cost of the relationships selected on `rows` objects of `mapper`."""
+        depth, cost = 0, 0.0
+        for selected in iter_fields(selection_set, fragments):
+            if selected.selection_set is None:  # a column
+                continue
+            rel = None if mapper is None else mapper.relationships.get(selected.name.value)
+            related_rows = rows * stats.fanouts.get(rel, 1.0) if rel is not None else rows
+            field_depth, field_cost = self.estimate_selection(
+                stats, None if rel is None else rel.mapper, selected.selection_set, related_rows, fragments
+            )
+            depth = max(depth, 1 + field_depth)
+            cost += related_rows + field_cost
+        return depth, cost
+
+
+def count_links(session: Session, rel: RelationshipProperty) -> int:
+    """Number of pairs of rows that `rel` relates."""
+    if rel.secondary is not None:
+        stmt = select(func.count()).select_from(rel.secondary)
+    elif rel.direction is RelationshipDirection.MANYTOONE:
+        [(_, local_col)] = rel.synchronize_pairs
+        stmt = select(func.count()).where(local_col.is_not(None))
+    else:
+        [(_, remote_col)] = rel.synchronize_pairs
+        stmt = select(func.count()).where(remote_col.is_not(None))
+    return session.scalar(stmt) or 0
+
+
+def get_argument(node: FieldNode, name: str) -> int | None:
+    """The value of an integer argument, if it’s given literally."""
+    for argument in node.arguments:
+        if argument.name.value == name and isinstance(argument.value, IntValueNode):
+            return int(argument.value.value)
+    return None
+
+
+def make_cost_rule(estimator: CostEstimator, *, max_depth: int, max_cost: int) -> type[ValidationRule]:
+    """A validation rule that rejects operations deeper than `max_depth` or costlier than `max_cost`."""
+
+    class CostRule(ValidationRule):
+        def enter_operation_definition(self, node: OperationDefinitionNode, *_args: object) -> None:
+            try:
+                estimate = estimator.get_cost(self.context.document, node)
+            except NotCacheable:  # unknown and cyclic fragments are reported by other rules
+                return
+            if estimate.depth > max_depth:
+                message = f"Query depth {estimate.depth} exceeds the maximum of {max_depth}"
+                self.report_error(GraphQLError(message, node, extensions={"depth": estimate.depth, "max_depth": max_depth}))
+            if estimate.cost > max_cost:
+                message = f"Query cost {estimate.cost:,} exceeds the maximum of {max_cost:,}"
+                self.report_error(GraphQLError(message, node, extensions={"cost": estimate.cost, "max_cost": max_cost}))
+
+    return CostRule
+
+
+def make_cost_rules(estimator: CostEstimator, *, max_depth: int, max_cost: int) -> Callable[..., list[type[ValidationRule]]]:
+    """Ariadne `validation_rules` with a `make_cost_rule` rule that is made anew whenever the statistics are reloaded.
+
+    Validation results memoized by their rules, like those of `DocumentCache`, then don’t outlive the statistics.
+    """
+    current: tuple[TableStats, list[type[ValidationRule]]] | None = None
+
+    def get_rules(*_args: object) -> list[type[ValidationRule]]:
+        nonlocal current
+        stats = estimator.stats
+        if current is None or current[0] is not stats:
+            current = (stats, [make_cost_rule(estimator, max_depth=max_depth, max_cost=max_cost)])
+        return current[1]
+
+    return get_rules
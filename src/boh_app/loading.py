@@ -0,0 +1,59 @@
+"""
+Eager loading of the relationships that a model’s serializer reads.
+
+Validating `Model.__pydantic__` from an ORM object touches every relationship it serializes,
+which lazy-loads them one object at a time. The loader options here fetch them up front instead.
+"""
+
+import sys
+from functools import cache
+from types import NoneType, UnionType
+from typing import Any, ForwardRef, Union, get_args, get_origin
+
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import Mapper, RelationshipProperty, joinedload, selectinload
+from sqlalchemy.orm.strategy_options import _AbstractLoad
+
+from .models import Base
+
+
+@cache
+def get_loader_options(model: type[Base]) -> tuple[_AbstractLoad, ...]:
+    """Loader options for the relationships that `model.__pydantic__` serializes, at any depth.
+
+    Collections are loaded with one `SELECT … IN` per relationship, many-to-one relationships are joined.
+    """
+    return tuple(get_relationship_loads(inspect(model), model.__pydantic__))
+
+
+def get_relationship_loads(
+    mapper: Mapper, pydantic_model: type[BaseModel], parent: _AbstractLoad | None = None, path: frozenset[type] = frozenset()
+) -> list[_AbstractLoad]:
+    path = path | {pydantic_model}  # self-referencing models would otherwise recurse forever
+    options = []
+    for name, field in pydantic_model.model_fields.items():
+        if (rel := mapper.relationships.get(name)) is None:
+            continue
+        load = load_relationship(rel, parent)
+        nested = [m for m in get_nested_models(field.annotation) if issubclass(m, BaseModel) and m not in path]
+        child_options = [option for m in nested for option in get_relationship_loads(rel.mapper, m, load, path)]
+        options.extend(child_options or [load])
+    return options
+
+
+def load_relationship(rel: RelationshipProperty, parent: _AbstractLoad | None = None) -> _AbstractLoad:
+    attr = getattr(rel.parent.class_, rel.key)
+    strategy = selectinload if rel.uselist else joinedload
+    return strategy(attr) if parent is None else getattr(parent, strategy.__name__)(attr)
+
+
+def get_nested_models(typ: Any) -> list[type]:
+    """The classes in an annotation like `list[X]` or `X | None`."""
+    if isinstance(typ, ForwardRef):
+        return [getattr(sys.modules[typ.__forward_module__], typ.__forward_arg__)]
+    if get_origin(typ) in (UnionType, Union, list):
+        return [cls for arg in get_args(typ) for cls in get_nested_models(arg)]
+    if isinstance(typ, type) and typ is not NoneType:
+        return [typ]
+    return []
@@ -4,7 +4,7 @@ from typing import TYPE_CHECKING, ClassVar, cast
 
 from marshmallow.fields import Boolean, List
 from marshmallow.fields import Enum as EnumField
-from sqlalchemy import Column, ForeignKey, Table
+from sqlalchemy import Column, ForeignKey, Integer, String, Table
 from sqlalchemy import Enum as SqlaEnum
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, registry, relationship
@@ -13,6 +13,8 @@ from .data.types import CraftingAction, Principle
 from .data.types_sqla import JsonArray
 
 if TYPE_CHECKING:
+    from collections.abc import Callable
+
     from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
     from pydantic import BaseModel
 
@@ -34,6 +36,38 @@ def get_tablename_model_mapping() -> dict[str, type[Base]]:
     return tablename_model_mapping
 
 
+# bookkeeping tables, not mapped to any model
+
+data_manifest = Table(
+    "data_manifest",
+    Base.metadata,
+    Column("table_name", String, primary_key=True),
+    Column("path", String, nullable=False),
+    Column("file_digest", String, nullable=False),
+    Column("table_digest", String, nullable=False),
+)
+
+table_version = Table(
+    "table_version",
+    Base.metadata,
+    Column("table_name", String, primary_key=True),
+    Column("version", Integer, nullable=False),
+)
+
+
+HYBRID_DEPENDENCIES = "depends_on"
+
+
+def depends_on(*names: str) -> Callable[[hybrid_property], hybrid_property]:
+    """Declare the attributes a hybrid property reads, so that sparse fieldsets load them with it."""
+
+    def decorate(hybrid: hybrid_property) -> hybrid_property:
+        hybrid.info[HYBRID_DEPENDENCIES] = frozenset(names)
+        return hybrid
+
+    return decorate
+
+
 class IdMixin:
     id: Mapped[int] = mapped_column(primary_key=True)
 
@@ -129,10 +163,11 @@ class Skill(Base, NameMixin):
 
     level: Mapped[int] = mapped_column(default=0)
     committed: Mapped[bool] = mapped_column(default=False)
-    primary_principle: Mapped[Principle]
-    secondary_principle: Mapped[Principle]
+    primary_principle: Mapped[Principle] = mapped_column(index=True)
+    secondary_principle: Mapped[Principle] = mapped_column(index=True)
     wisdoms: Mapped[list[Wisdom]] = relationship(back_populates="skills", secondary=skill_wisdom_association)
 
+    @depends_on("primary_principle", "secondary_principle")
     @hybrid_property
     def principles(self) -> list[Principle]:
         return [self.primary_principle, self.secondary_principle]
@@ -152,26 +187,27 @@ class Item(Base, NameMixin):
     name: Mapped[str]
     aspects: Mapped[list[Aspect]] = relationship(back_populates="items", secondary=item_aspect_association)
 
-    known: Mapped[bool] = mapped_column(default=False)
+    known: Mapped[bool] = mapped_column(default=False, index=True)
 
     # principles
-    edge: Mapped[int] = mapped_column(default=0)
-    forge: Mapped[int] = mapped_column(default=0)
-    grail: Mapped[int] = mapped_column(default=0)
-    heart: Mapped[int] = mapped_column(default=0)
-    knock: Mapped[int] = mapped_column(default=0)
-    lantern: Mapped[int] = mapped_column(default=0)
-    moon: Mapped[int] = mapped_column(default=0)
-    moth: Mapped[int] = mapped_column(default=0)
-    nectar: Mapped[int] = mapped_column(default=0)
-    rose: Mapped[int] = mapped_column(default=0)
-    scale: Mapped[int] = mapped_column(default=0)
-    sky: Mapped[int] = mapped_column(default=0)
-    winter: Mapped[int] = mapped_column(default=0)
+    edge: Mapped[int] = mapped_column(default=0, index=True)
+    forge: Mapped[int] = mapped_column(default=0, index=True)
+    grail: Mapped[int] = mapped_column(default=0, index=True)
+    heart: Mapped[int] = mapped_column(default=0, index=True)
+    knock: Mapped[int] = mapped_column(default=0, index=True)
+    lantern: Mapped[int] = mapped_column(default=0, index=True)
+    moon: Mapped[int] = mapped_column(default=0, index=True)
+    moth: Mapped[int] = mapped_column(default=0, index=True)
+    nectar: Mapped[int] = mapped_column(default=0, index=True)
+    rose: Mapped[int] = mapped_column(default=0, index=True)
+    scale: Mapped[int] = mapped_column(default=0, index=True)
+    sky: Mapped[int] = mapped_column(default=0, index=True)
+    winter: Mapped[int] = mapped_column(default=0, index=True)
 
     source_recipe: Mapped[list[Recipe]] = relationship(back_populates="product", primaryjoin="Item.id==Recipe.product_id")
     product_recipe: Mapped[list[Recipe]] = relationship(back_populates="source_item", primaryjoin="Item.id==Recipe.source_item_id")
 
+    @depends_on("source_recipe")
     @hybrid_property
     def is_craftable(self) -> bool:
         return len(self.source_recipe) > 0
@@ -191,10 +227,10 @@ class Recipe(Base, NameMixin):
     product: Mapped[Item] = relationship(back_populates="source_recipe", foreign_keys=[product_id])
 
     source_item_id: Mapped[str | None] = mapped_column(ForeignKey("item.id"))
-    source_item: Mapped[Item] = relationship(back_populates="product_recipe", foreign_keys=[source_item_id])
+    source_item: Mapped[Item | None] = relationship(back_populates="product_recipe", foreign_keys=[source_item_id])
 
     source_aspect_id: Mapped[str | None] = mapped_column(ForeignKey("aspect.id"))
-    source_aspect: Mapped[Aspect] = relationship()
+    source_aspect: Mapped[Aspect | None] = relationship()
 
     principle: Mapped[Principle]
     principle_amount: Mapped[int]
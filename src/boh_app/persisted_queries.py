@@ -0,0 +1,112 @@
+"""
+Persisted GraphQL queries, and a cache of parsed and validated documents.
+
+The frontend sends the same few documents on every load. They are extracted from the ``graphql(`…`)`` calls in
+``src/front`` by ``boh_app gen-persisted-queries`` into `PERSISTED_QUERIES_PATH`, keyed by the SHA-256 of the printed
+document, and parsed once on startup. Clients can send just that hash, like Apollo’s persisted queries:
+``{"extensions": {"persistedQuery": {"version": 1, "sha256Hash": "…"}}}``.
+
+Other documents are parsed once per query string and kept in an LRU cache. Each document is validated only once,
+as it’s the same object every time. With `persisted_only`, only documents equal to a persisted one are executed.
+"""
+
+import json
+import re
+from collections.abc import Collection, Mapping
+from functools import lru_cache
+from hashlib import sha256
+from pathlib import Path
+from typing import Any
+
+from graphql import DocumentNode, GraphQLError, GraphQLSchema, parse, print_ast, validate
+from graphql.validation import ASTValidationRule
+
+HERE = Path(__file__).parent
+
+PERSISTED_QUERIES_PATH = HERE / "persisted_queries.json"
+FRONT_DIR = HERE.parent / "front"
+
+# a `graphql` template literal without substitutions, as the codegen client preset requires
+GRAPHQL_CALL_RE = re.compile(r"\bgraphql\(\s*`([^`$]*)`\s*\)")
+
+PERSISTED_QUERY_NOT_FOUND = "PersistedQueryNotFound"
+PERSISTED_QUERY_REQUIRED = "Only persisted queries are allowed"
+# attribute keeping a document’s validation errors on its `DocumentNode`, with the schema, rules and `max_errors` they are for.
+# Not a `WeakKeyDictionary`: AST nodes hash and compare by structure, so each lookup would compare the documents recursively.
+VALIDATION_ATTR = "_boh_app_validation"
+
+
+def get_query_hash(query: str) -> str:
+    return sha256(query.encode()).hexdigest()
+
+
+def extract_persisted_queries(front_dir: Path = FRONT_DIR) -> dict[str, str]:
+    """Printed documents of the frontend’s `graphql` calls, by hash."""
+    queries = {}
+    for path in sorted(front_dir.rglob("*.ts*")):
+        for match in GRAPHQL_CALL_RE.finditer(path.read_text()):
+            query = print_ast(parse(match[1]))
+            queries[get_query_hash(query)] = query
+    return dict(sorted(queries.items(), key=lambda item: item[1]))
+
+
+def render_persisted_queries(queries: Mapping[str, str]) -> str:
+    return json.dumps(queries, indent=2) + "\n"
+
+
+def load_persisted_queries(path: Path = PERSISTED_QUERIES_PATH) -> dict[str, str]:
+    return json.loads(path.read_text()) if path.is_file() else {}
+
+
+class DocumentCache:
+    """`query_parser` and `query_validator` for ariadne that parse and validate each document once."""
+
+    def __init__(self, persisted: Mapping[str, str], *, maxsize: int = 256, persisted_only: bool = False) -> None:
+        self.persisted = dict(persisted)
+        self.persisted_only = persisted_only
+        # persisted documents are never evicted
+        self.persisted_documents = {query: parse(query) for query in self.persisted.values()}
+        self.parse_query = lru_cache(maxsize=maxsize)(self._parse_query)
+
+    def resolve(self, data: Any) -> Any:
+        """Fill in the query of a request that only has the hash of a persisted one."""
+        if not isinstance(data, dict) or data.get("query") is not None:
+            return data
+        persisted_query = (data.get("extensions") or {}).get("persistedQuery") or {}
+        if (query_hash := persisted_query.get("sha256Hash")) is None:
+            return data
+        if (query := self.persisted.get(query_hash)) is None:
+            raise GraphQLError(PERSISTED_QUERY_NOT_FOUND)
+        return {**data, "query": query}
+
+    def parse(self, _context: Any, data: dict[str, Any]) -> DocumentNode:
+        query = data["query"]
+        if (document := self.persisted_documents.get(query)) is not None:
+            return document
+        return self.parse_query(query)
+
+    def _parse_query(self, query: str) -> DocumentNode:
+        document = parse(query)
+        if self.persisted_only:  # the same document, only formatted differently
+            document = self.persisted_documents.get(print_ast(document))
+            if document is None:
+                raise GraphQLError(PERSISTED_QUERY_REQUIRED)
+        return document
+
+    def validate(
+        self,
+        schema: GraphQLSchema,
+        document_ast: DocumentNode,
+        rules: Collection[type[ASTValidationRule]] | None = None,
+        max_errors: int | None = None,
+        **kwargs: Any,
+    ) -> list[GraphQLError]:
+        if kwargs:  # e.g. a `type_info`, which validation changes
+            return validate(schema, document_ast, rules, max_errors, **kwargs)
+        # the result is kept on the document, with everything it depends on; the rules change when the cost statistics do
+        key = (schema, None if rules is None else tuple(rules), max_errors)
+        memo: tuple[tuple[Any, ...], list[GraphQLError]] | None = getattr(document_ast, VALIDATION_ATTR, None)
+        if memo is None or memo[0] != key:
+            memo = (key, validate(schema, document_ast, rules, max_errors))
+            setattr(document_ast, VALIDATION_ATTR, memo)
+        return memo[1]
@@ -4,38 +4,132 @@ sqlalchemy_to_marshmallow is modified from https://marshmallow-sqlalchemy.readth
 
 import sys
 import warnings
+from collections.abc import Callable
+from functools import cache
+from importlib import import_module
 from types import ModuleType
+from typing import Any
 
-from sqlalchemy.orm import DeclarativeBase, Session
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import DeclarativeBase, Session, configure_mappers
 from sqlalchemy.orm.clsregistry import ClsRegistryToken, _ModuleMarker
 
 from ..models import Base, IdMixin
+from .codegen import GENERATED_MODULE, get_source_digest
 from .marshmallow import sqlalchemy_to_marshmallow
 from .pydantic import SYNTH_MODULE, sqlalchemy_to_pydantic
 
+SERIALIZER_ATTRS = ("__marshmallow__", "__pydantic__", "__pydantic_put__")
 
-def setup_schema(decl_base: type[DeclarativeBase], *, session: Session) -> None:
-    mod = sys.modules[SYNTH_MODULE] = ModuleType(SYNTH_MODULE)
 
+class LazySerializer:
+    """Descriptor that builds a model’s serializer on first access and caches it on the model class."""
+
+    def __init__(self, name: str, build: Callable[[type[Base]], Any]) -> None:
+        self.name = name
+        self.build = build
+
+    def __get__(self, instance: Base | None, owner: type[Base]) -> Any:
+        serializer = self.build(owner)
+        setattr(owner, self.name, serializer)
+        return serializer
+
+
+def get_classes(decl_base: type[DeclarativeBase]) -> list[type[Base]]:
     classes: list[type[Base]] = []
     for class_ in decl_base.registry._class_registry.values():
         if isinstance(class_, ClsRegistryToken):
             if not isinstance(class_, _ModuleMarker):
-                warnings.warn(f"setup_schema does not work with ClsRegistryToken {class_}", stacklevel=2)
+                warnings.warn(f"setup_schema does not work with ClsRegistryToken {class_}", stacklevel=3)
             continue
         assert issubclass(class_, Base), class_.mro()
         classes.append(class_)
+    return classes
+
+
+def setup_schema(decl_base: type[DeclarativeBase], *, session: Session) -> None:
+    """Make the serializers of all models in `decl_base` available, synthesizing each one when first used."""
+    sys.modules[SYNTH_MODULE] = ModuleType(SYNTH_MODULE)
+    get_flat_model.cache_clear()
+
+    for class_ in get_classes(decl_base):
+        for attr in SERIALIZER_ATTRS:
+            if attr in vars(class_):
+                delattr(class_, attr)  # built for a previous session
+
+    def build_marshmallow(class_: type[Base]):
+        return sqlalchemy_to_marshmallow(class_, session=session)
+
+    decl_base.__marshmallow__ = LazySerializer("__marshmallow__", build_marshmallow)
+    decl_base.__pydantic__ = LazySerializer("__pydantic__", build_pydantic)
+    decl_base.__pydantic_put__ = LazySerializer("__pydantic_put__", build_pydantic_put)
+
+
+@cache
+def get_generated_module() -> ModuleType | None:
+    """The module written by `gen-serializers`, if it exists and matches the models."""
+    try:
+        generated = import_module(f".{GENERATED_MODULE}", __package__)
+    except ImportError:
+        return None
+    if generated.SOURCE_DIGEST != get_source_digest():
+        warnings.warn("Generated serializers are out of date, run `boh_app gen-serializers`", stacklevel=2)
+        return None
+    return generated
+
+
+def reflect_flat(class_: type[Base]) -> type[BaseModel]:
+    return sqlalchemy_to_pydantic(class_, flat=True)
+
+
+def reflect_nested(class_: type[Base]) -> type[BaseModel]:
+    return sqlalchemy_to_pydantic(class_)
+
+
+def reflect_put(class_: type[Base]) -> type[BaseModel]:
+    exclude = ("id",) if issubclass(class_, IdMixin) else ()
+    return sqlalchemy_to_pydantic(
+        class_, include_relationships=True, include_hybrid=False, exclude=exclude, name=f"{class_.__name__}PutModel"
+    )
+
+
+def reflect_pydantic_models(decl_base: type[DeclarativeBase]) -> list[type[BaseModel]]:
+    """Reflect all pydantic models, ordered so that models come after the models they refer to."""
+    configure_mappers()
+    classes = get_classes(decl_base)
+    return [reflect(class_) for reflect in (reflect_flat, reflect_nested, reflect_put) for class_ in classes]
+
+
+def get_generated(name: str) -> type[BaseModel] | None:
+    if (generated := get_generated_module()) is None:
+        return None
+    return getattr(generated, name)
+
+
+@cache
+def get_flat_model(class_: type[Base]) -> type[BaseModel]:
+    """Get the model that nested models refer to for `class_`, and register it for forward ref resolution."""
+    pydantic_model = get_generated(f"{class_.__name__}FlatModel") or reflect_flat(class_)
+    setattr(sys.modules[SYNTH_MODULE], pydantic_model.__name__, pydantic_model)
+    return pydantic_model
+
+
+def resolve_forward_refs(class_: type[Base]) -> None:
+    for rel in inspect(class_).relationships:
+        get_flat_model(rel.mapper.class_)
+
 
-    for class_ in classes:
-        pydantic_model = sqlalchemy_to_pydantic(class_, flat=True)
-        setattr(mod, pydantic_model.__name__, pydantic_model)
+def build_pydantic(class_: type[Base]) -> type[BaseModel]:
+    if (pydantic_model := get_generated(f"{class_.__name__}Model")) is None:
+        resolve_forward_refs(class_)
+        pydantic_model = reflect_nested(class_)
+    setattr(sys.modules[SYNTH_MODULE], pydantic_model.__name__, pydantic_model)
+    return pydantic_model
 
-    for class_ in classes:
-        class_.__marshmallow__ = sqlalchemy_to_marshmallow(class_, session=session)
-        class_.__pydantic__ = sqlalchemy_to_pydantic(class_)
 
-        exclude = ("id",) if issubclass(class_, IdMixin) else ()
-        class_.__pydantic_put__ = sqlalchemy_to_pydantic(
-            class_, flat=False, include_relationships=True, include_hybrid=False, exclude=exclude
-        )
-        setattr(mod, class_.__pydantic__.__name__, class_.__pydantic__)
+def build_pydantic_put(class_: type[Base]) -> type[BaseModel]:
+    if (pydantic_model := get_generated(f"{class_.__name__}PutModel")) is None:
+        resolve_forward_refs(class_)
+        pydantic_model = reflect_put(class_)
+    return pydantic_model
@@ -0,0 +1,87 @@
+"""
+Render synthesized pydantic models as an importable module,
+so the server doesn’t have to reflect over the SQLAlchemy models on every start.
+"""
+
+from collections.abc import Iterable
+from enum import Enum
+from hashlib import sha256
+from pathlib import Path
+from types import NoneType, UnionType
+from typing import Any, ForwardRef, Union, get_args, get_origin
+
+from pydantic import BaseModel
+
+HERE = Path(__file__).parent
+
+GENERATED_MODULE = "generated"
+GENERATED_PATH = HERE / f"{GENERATED_MODULE}.py"
+
+# files whose content determines the synthesized models
+SOURCE_FILES = [
+    HERE.parent / "models.py",
+    HERE.parent / "data/types.py",
+    HERE.parent / "data/types_sqla.py",
+    HERE / "pydantic.py",
+    HERE / "codegen.py",
+]
+
+
+def get_source_digest() -> str:
+    digest = sha256()
+    for path in SOURCE_FILES:
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def render_module(pydantic_models: Iterable[type[BaseModel]]) -> str:
+    """Render `pydantic_models` as source code. Models need to come after the models they refer to."""
+    imports: dict[str, set[str]] = {}
+    classes = [render_model(model, imports) for model in pydantic_models]
+    import_lines = [f"from {module} import {', '.join(sorted(names))}" for module, names in sorted(imports.items())]
+    return "\n".join(
+        [
+            "# Generated by `boh_app gen-serializers`. Do not edit.",
+            "",
+            "from pydantic import BaseModel, ConfigDict, Field",
+            "",
+            *import_lines,
+            "",
+            f'SOURCE_DIGEST = "{get_source_digest()}"',
+            "",
+            *classes,
+        ]
+    )
+
+
+def render_model(model: type[BaseModel], imports: dict[str, set[str]]) -> str:
+    lines = ["", f"class {model.__name__}(BaseModel):"]
+    config = ", ".join(f"{k}={v!r}" for k, v in model.model_config.items())
+    lines.append(f"    model_config = ConfigDict({config})")
+    if model.model_fields:
+        lines.append("")
+    for name, field in model.model_fields.items():
+        annotation = render_type(field.annotation, imports)
+        if field.is_required():
+            lines.append(f"    {name}: {annotation}")
+        elif field.default_factory is list:
+            lines.append(f"    {name}: {annotation} = Field(default_factory=list)")
+        else:
+            lines.append(f"    {name}: {annotation} = {field.default!r}")
+    return "\n".join([*lines, ""])
+
+
+def render_type(typ: Any, imports: dict[str, set[str]]) -> str:
+    if typ is None or typ is NoneType:
+        return "None"
+    if isinstance(typ, ForwardRef):
+        return typ.__forward_arg__
+    if get_origin(typ) in (UnionType, Union):
+        return " | ".join(render_type(arg, imports) for arg in get_args(typ))
+    if get_origin(typ) is list:
+        [arg] = get_args(typ)
+        return f"list[{render_type(arg, imports)}]"
+    if isinstance(typ, type) and issubclass(typ, Enum):
+        module = typ.__module__.removeprefix(f"{__package__.rpartition('.')[0]}.")
+        imports.setdefault(f"..{module}", set()).add(typ.__name__)
+    return typ.__name__
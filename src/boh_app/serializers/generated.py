@@ -0,0 +1,348 @@
+# Generated by `boh_app gen-serializers`. Do not edit.
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from ..data.types import CraftingAction, Principle
+
+SOURCE_DIGEST = "a211891043c94051d850f3a10d758b635bcfef123e691bc75601d8b283af0af7"
+
+
+class AspectFlatModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+
+
+class PrincipleCountFlatModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    principle: Principle
+    count: int
+    id: int
+
+
+class WisdomFlatModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+
+
+class SkillFlatModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    name: str
+    level: int
+    committed: bool
+    primary_principle: Principle
+    secondary_principle: Principle
+    id: str
+
+
+class ItemFlatModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    name: str
+    known: bool
+    edge: int
+    forge: int
+    grail: int
+    heart: int
+    knock: int
+    lantern: int
+    moon: int
+    moth: int
+    nectar: int
+    rose: int
+    scale: int
+    sky: int
+    winter: int
+    id: str
+
+
+class RecipeInternalFlatModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    recipe_id: str
+    id: str
+
+
+class RecipeFlatModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    product_id: str
+    source_item_id: str | None = None
+    source_aspect_id: str | None = None
+    principle: Principle
+    principle_amount: int
+    known: bool
+    crafting_action: CraftingAction
+    id: str
+
+
+class WorkstationTypeFlatModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+
+
+class WorkstationSlotFlatModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    name: str
+    index: int
+    id: str
+
+
+class WorkstationFlatModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    workstation_type_id: str
+    wisdom_id: str | None = None
+    principles: list
+    id: str
+
+
+class AssistantFlatModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    season: str | None = None
+    id: str
+
+
+class AspectModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    items: list[ItemFlatModel] = Field(default_factory=list)
+    assistants: list[AssistantFlatModel] = Field(default_factory=list)
+
+
+class PrincipleCountModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    principle: Principle
+    count: int
+    id: int
+    assistants: list[AssistantFlatModel] = Field(default_factory=list)
+
+
+class WisdomModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    skills: list[SkillFlatModel] = Field(default_factory=list)
+
+
+class SkillModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    name: str
+    level: int
+    committed: bool
+    primary_principle: Principle
+    secondary_principle: Principle
+    id: str
+    principles: list[Principle] = Field(default_factory=list)
+    wisdoms: list[WisdomFlatModel] = Field(default_factory=list)
+    recipes: list[RecipeFlatModel] = Field(default_factory=list)
+
+
+class ItemModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    name: str
+    known: bool
+    edge: int
+    forge: int
+    grail: int
+    heart: int
+    knock: int
+    lantern: int
+    moon: int
+    moth: int
+    nectar: int
+    rose: int
+    scale: int
+    sky: int
+    winter: int
+    id: str
+    is_craftable: bool
+    aspects: list[AspectFlatModel] = Field(default_factory=list)
+    source_recipe: list[RecipeFlatModel] = Field(default_factory=list)
+    product_recipe: list[RecipeFlatModel] = Field(default_factory=list)
+
+
+class RecipeInternalModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    recipe: RecipeFlatModel
+
+
+class RecipeModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    principle: Principle
+    principle_amount: int
+    known: bool
+    crafting_action: CraftingAction
+    id: str
+    product: ItemFlatModel
+    source_item: ItemFlatModel | None
+    source_aspect: AspectFlatModel | None
+    recipe_internals: list[RecipeInternalFlatModel] = Field(default_factory=list)
+    skills: list[SkillFlatModel] = Field(default_factory=list)
+
+
+class WorkstationTypeModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    workstations: list[WorkstationFlatModel] = Field(default_factory=list)
+
+
+class WorkstationSlotModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    name: str
+    index: int
+    id: str
+    workstations: list[WorkstationFlatModel] = Field(default_factory=list)
+    accepts: list[AspectFlatModel] = Field(default_factory=list)
+
+
+class WorkstationModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    principles: list
+    id: str
+    workstation_type: WorkstationTypeFlatModel
+    workstation_slots: list[WorkstationSlotFlatModel] = Field(default_factory=list)
+    evolves: WisdomFlatModel | None
+
+
+class AssistantModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    season: str | None = None
+    id: str
+    aspects: list[AspectFlatModel] = Field(default_factory=list)
+    base_principles: list[PrincipleCountFlatModel] = Field(default_factory=list)
+
+
+class AspectPutModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    items: list[ItemFlatModel] = Field(default_factory=list)
+    assistants: list[AssistantFlatModel] = Field(default_factory=list)
+
+
+class PrincipleCountPutModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    principle: Principle
+    count: int
+    assistants: list[AssistantFlatModel] = Field(default_factory=list)
+
+
+class WisdomPutModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    skills: list[SkillFlatModel] = Field(default_factory=list)
+
+
+class SkillPutModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    name: str
+    level: int
+    committed: bool
+    primary_principle: Principle
+    secondary_principle: Principle
+    id: str
+    wisdoms: list[WisdomFlatModel] = Field(default_factory=list)
+    recipes: list[RecipeFlatModel] = Field(default_factory=list)
+
+
+class ItemPutModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    name: str
+    known: bool
+    edge: int
+    forge: int
+    grail: int
+    heart: int
+    knock: int
+    lantern: int
+    moon: int
+    moth: int
+    nectar: int
+    rose: int
+    scale: int
+    sky: int
+    winter: int
+    id: str
+    aspects: list[AspectFlatModel] = Field(default_factory=list)
+    source_recipe: list[RecipeFlatModel] = Field(default_factory=list)
+    product_recipe: list[RecipeFlatModel] = Field(default_factory=list)
+
+
+class RecipeInternalPutModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    recipe: RecipeFlatModel
+
+
+class RecipePutModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    principle: Principle
+    principle_amount: int
+    known: bool
+    crafting_action: CraftingAction
+    id: str
+    product: ItemFlatModel
+    source_item: ItemFlatModel | None
+    source_aspect: AspectFlatModel | None
+    recipe_internals: list[RecipeInternalFlatModel] = Field(default_factory=list)
+    skills: list[SkillFlatModel] = Field(default_factory=list)
+
+
+class WorkstationTypePutModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    workstations: list[WorkstationFlatModel] = Field(default_factory=list)
+
+
+class WorkstationSlotPutModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    name: str
+    index: int
+    id: str
+    workstations: list[WorkstationFlatModel] = Field(default_factory=list)
+    accepts: list[AspectFlatModel] = Field(default_factory=list)
+
+
+class WorkstationPutModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    principles: list
+    id: str
+    workstation_type: WorkstationTypeFlatModel
+    workstation_slots: list[WorkstationSlotFlatModel] = Field(default_factory=list)
+    evolves: WisdomFlatModel | None
+
+
+class AssistantPutModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    season: str | None = None
+    id: str
+    aspects: list[AspectFlatModel] = Field(default_factory=list)
+    base_principles: list[PrincipleCountFlatModel] = Field(default_factory=list)
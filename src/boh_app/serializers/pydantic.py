@@ -26,13 +26,14 @@ def sqlalchemy_to_pydantic(
     flat: bool = False,  # includes FKs when True
     include_relationships: bool = True,
     include_hybrid: bool = True,
+    name: str | None = None,
 ) -> type[BaseModel]:
     simple_fields = dict(convert_simple_fields(db_model, exclude=exclude, include_fk=flat))
     fields = simple_fields
     if flat:
-        name = f"{db_model.__name__}FlatModel"
+        name = name or f"{db_model.__name__}FlatModel"
     else:
-        name = f"{db_model.__name__}Model"
+        name = name or f"{db_model.__name__}Model"
         if include_hybrid:
             prop_fields = dict(convert_hybrid_properties(db_model, exclude=exclude))
             fields = fields | prop_fields
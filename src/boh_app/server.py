@@ -1,38 +1,182 @@
-from typing import Any
+import dataclasses
+import json
+import os
+from collections.abc import AsyncGenerator, Callable, Collection, Generator, Iterator, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from http import HTTPStatus  # starlette’s name for 422 changed
+from inspect import signature
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Literal
 
-import rich.traceback
-from ariadne.asgi import GraphQL
-from ariadne.asgi.handlers import GraphQLTransportWSHandler
-from fastapi import Depends, FastAPI, HTTPException, Request, Response, status
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query, Request, Response, WebSocket, status
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware import Middleware
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import Engine, Select, func, inspect, select
+from sqlalchemy.orm import Session, configure_mappers, sessionmaker
 
-from .database import SessionLocal, get_sess, init_db
-from .graphql import gql_schema
-from .models import Base
+from .cache import CachedResponse, ResponseCache
+from .data.bulk import bulk_load
+from .database import (
+    DEFAULT_PROFILE,
+    SNAPSHOT_PATH,
+    SessionLocal,
+    create_async_db_engine,
+    create_db_engine,
+    get_async_sess,
+    get_engine,
+    get_read_sess,
+    get_sess,
+    load_db,
+)
+from .fieldsets import EXPAND_DESCRIPTION, FIELDS_DESCRIPTION, Fieldset, dump_json, get_pydantic_model
+from .filters import FILTERS_DESCRIPTION, Filters
+from .loading import get_loader_options
+from .models import Base, get_tablename_model_mapping
+from .settings import (
+    ASYNC_DB,
+    DB_INITIALIZED_ENV,
+    GRAPHQL_CACHE_BYTES,
+    GRAPHQL_DOCUMENT_CACHE_SIZE,
+    GRAPHQL_MAX_COST,
+    GRAPHQL_MAX_DEPTH,
+    GRAPHQL_THREADS,
+    PERSISTED_QUERIES_ONLY,
+    RESPONSE_CACHE_BYTES,
+)
+from .versions import bump_versions, etag_matches, get_etag, get_model_tables, get_versions
+from .writers import get_patch_model, get_writer
 
-rich.traceback.install(width=None)  # , show_locals=True)
+router = APIRouter()
 
-app = FastAPI()
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+COLLECTION_PARAMS = frozenset({"limit", "after", "total", "fields", "expand", "format"})  # not filters
 
-cors = Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
-app.user_middleware.insert(0, cors)
 
-# TODO: is not wrapped for test isolation
-graphql_app = GraphQL(
-    gql_schema,
-    context_value={"session": SessionLocal()},
-    websocket_handler=GraphQLTransportWSHandler(),
-)
+@dataclasses.dataclass
+class StartupProfile:
+    """Wall time spent in each startup phase, in seconds."""
+
+    phases: dict[str, float] = dataclasses.field(default_factory=dict)
+
+    @contextmanager
+    def phase(self, name: str) -> Generator[None, None, None]:
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = perf_counter() - start
+
+
+def create_app(engine: Engine | None = None, *, snapshot: Path | None = SNAPSHOT_PATH, async_db: bool = ASYNC_DB) -> FastAPI:
+    """Create the app. The database, serializers and GraphQL schema are set up when it starts.
+
+    With `async_db`, the table endpoints run on the event loop with an aiosqlite engine, instead of in a thread pool.
+    """
+    import rich.traceback
+
+    rich.traceback.install(width=None)  # , show_locals=True)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+        startup(app, engine=engine, snapshot=snapshot, async_db=async_db)
+        yield
+        app.state.graphql_executor.shutdown()
+        if app.state.mk_read_session is not app.state.mk_session:
+            app.state.read_engine.dispose()
+        if async_db:
+            await app.state.async_engine.dispose()
+
+    app = FastAPI(lifespan=lifespan)
+    cors = Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+    app.user_middleware.insert(0, cors)
+    app.include_router(router)
+    return app
+
+
+def startup(app: FastAPI, *, engine: Engine | None = None, snapshot: Path | None = SNAPSHOT_PATH, async_db: bool = False) -> StartupProfile:
+    from ariadne.asgi import GraphQL
+    from ariadne.asgi.handlers import GraphQLTransportWSHandler
+
+    from .graphql import ThreadedGraphQLHTTPHandler, get_gql_schema, get_request_context
+    from .graphql_cost import CostEstimator, make_cost_rules
+    from .persisted_queries import DocumentCache, load_persisted_queries
+    from .serializers import setup_schema
+
+    profile = app.state.startup_profile = StartupProfile()
+    if engine is None:
+        engine = get_engine()
+        mk_session = SessionLocal
+        mk_session.configure(bind=engine)
+    else:
+        mk_session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    app.state.mk_session = mk_session
+    if os.environ.get(DB_INITIALIZED_ENV):
+        # a worker of a multi-process server: reads, which are most requests, go through connections that can’t write,
+        # so only the few writes contend for SQLite’s write lock, while WAL lets the readers go on meanwhile
+        app.state.read_engine = create_db_engine(engine.url, dataclasses.replace(DEFAULT_PROFILE, query_only=True), echo=engine.echo)
+        app.state.mk_read_session = sessionmaker(autocommit=False, autoflush=False, bind=app.state.read_engine)
+    else:
+        app.state.read_engine = engine
+        app.state.mk_read_session = mk_session
+    if async_db:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        app.state.async_engine = create_async_db_engine(engine)
+        app.state.mk_async_session = async_sessionmaker(app.state.async_engine, autoflush=False)
+    app.state.response_cache = ResponseCache(RESPONSE_CACHE_BYTES)
+    app.state.graphql_cache = ResponseCache(GRAPHQL_CACHE_BYTES)
 
+    with profile.phase("mappers"):
+        configure_mappers()
+    with profile.phase("schema synthesis"):
+        with mk_session() as session:
+            setup_schema(Base, session=session)
+        for table_name, model in get_tablename_model_mapping().items():
+            register_model(app.router, table_name, model, async_db=async_db)
+    with profile.phase("GraphQL build"):
+        app.state.graphql_executor = ThreadPoolExecutor(GRAPHQL_THREADS, thread_name_prefix="graphql")
+        costs = CostEstimator(app.state.mk_read_session)
+        documents = DocumentCache(load_persisted_queries(), maxsize=GRAPHQL_DOCUMENT_CACHE_SIZE, persisted_only=PERSISTED_QUERIES_ONLY)
+        app.state.graphql_app = GraphQL(
+            get_gql_schema(),
+            context_value=get_request_context,
+            query_parser=documents.parse,
+            query_validator=documents.validate,
+            validation_rules=make_cost_rules(costs, max_depth=GRAPHQL_MAX_DEPTH, max_cost=GRAPHQL_MAX_COST),
+            http_handler=ThreadedGraphQLHTTPHandler(app.state.graphql_executor, documents, app.state.graphql_cache, costs),
+            websocket_handler=GraphQLTransportWSHandler(),
+        )
+    if not os.environ.get(DB_INITIALIZED_ENV):
+        with profile.phase("data load"):
+            load_db(engine, mk_session, snapshot=snapshot)
+    return profile
 
-@app.get("/")
+
+@router.get("/")
 async def root():
     return {"message": "Hello World"}
 
 
-@app.get("/user_data")
+@router.get("/_cache")
+def get_cache_stats(request: Request):
+    """Statistics of the response cache, and of the GraphQL result cache under `graphql`."""
+    return {**describe_cache(request.app.state.response_cache), "graphql": describe_cache(request.app.state.graphql_cache)}
+
+
+def describe_cache(cache: ResponseCache) -> dict[str, int | float]:
+    stats = cache.stats
+    hit_rate = stats.hits / lookups if (lookups := stats.hits + stats.misses) else 0.0
+    return {**dataclasses.asdict(stats), "hit_rate": hit_rate, "entries": len(cache), "bytes": cache.size, "max_bytes": cache.max_bytes}
+
+
+@router.get("/user_data")
 def get_user_data():
     from boh_app.data.process_autosave import get_knowns
 
@@ -40,76 +184,274 @@ def get_user_data():
 
 
 # See: https://ariadnegraphql.org/docs/fastapi-integration#graphql-routes
-@app.get("/graphql")
-@app.options("/graphql")
+@router.get("/graphql")
+@router.options("/graphql")
 async def handle_graphql_explorer(request: Request):
-    return await graphql_app.handle_request(request)
+    return await request.app.state.graphql_app.handle_request(request)
 
 
-@app.post("/graphql")
+@router.post("/graphql")
 async def handle_graphql_query(request: Request, db=Depends(get_sess)):
-    request.scope["db"] = db
-    return await graphql_app.handle_request(request)
+    request.scope["db"] = db  # for `get_request_context`
+    return await request.app.state.graphql_app.handle_request(request)
+
+
+@router.websocket("/graphql")
+async def handle_graphql_websocket(websocket: WebSocket):
+    await websocket.app.state.graphql_app.handle_websocket(websocket)
+
+
+class PatchOperation(BaseModel):
+    table: str
+    id: str | int
+    patch: dict[str, Any]
+
+
+@router.patch("/_batch", response_model=list[dict[str, Any]], summary="Update rows of several tables at once")
+def patch_batch(operations: list[PatchOperation], session: Session = Depends(get_sess)):
+    """Apply all operations in one transaction. If any of them fails, none are applied."""
+    tablename2model = get_tablename_model_mapping()
+    results = []
+    with session.begin():
+        for i, op in enumerate(operations):
+            if (model := tablename2model.get(op.table)) is None:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Operation {i}: no table {op.table}")
+            if not (item := session.get(model, op.id)):
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Operation {i}: no {op.table} with ID {op.id}")
+            try:
+                patch = get_patch_model(model).model_validate(op.patch)
+            except ValidationError as e:
+                errors = e.errors(include_url=False, include_context=False)
+                raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail={"operation": i, "errors": errors}) from e
+            get_writer(model).update(session, item, patch.model_dump(exclude_unset=True))
+            results.append((model, item))
+        session.flush()
+        return json_response(b"[" + b",".join(dump_json(model, None, item) for model, item in results) + b"]")
+
+
+def json_response(body: bytes, status_code: int = status.HTTP_200_OK, headers: Mapping[str, str] | None = None) -> Response:
+    """Response for a body encoded by pydantic, which FastAPI would otherwise validate and encode again."""
+    return Response(body, status_code=status_code, headers=headers, media_type="application/json")
+
+
+def check_not_modified(request: Request, etag: str) -> Response | None:
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return None
+
 
+def cached_get(request: Request, response: Response, session: Session, tables: Collection[str], render: Callable[[], bytes]) -> Response:
+    """Answer a GET for a response built from `tables`.
 
-def update_model(model: Base, item: Base, data: dict[str, Any], session: Session):
-    # marshmallow loads nested items as model objects, which can be set on model
-    serializer = model.__marshmallow__(session=session)
-    m_item: Base = serializer.load(data)
-    for field in data:
-        setattr(item, field, getattr(m_item, field))
-    return item
+    Returns a 304 response if the client’s copy is still current, otherwise the cached response or the one `render` builds.
+    `render` can set headers on `response`, which are cached along with the body.
+    """
+    etag = get_etag(get_versions(session, tables))
+    if not_modified := check_not_modified(request, etag):
+        return not_modified
+    cache: ResponseCache = request.app.state.response_cache
+    key = (str(request.url), etag)
+    if (cached := cache.get(key)) is None:
+        response.headers["ETag"] = etag
+        body = render()
+        cached = cache.put(key, CachedResponse(body, dict(response.headers), frozenset(tables)))
+    return json_response(cached.body, headers=cached.headers)
 
 
-def register_model(table_name: str, model: type[Base]):
-    @app.get(
+def stream_ndjson(mk_session: sessionmaker[Session], stmt: Select, pydantic_model: type[BaseModel]) -> Iterator[bytes]:
+    """Serialize rows one at a time while fetching them in batches, so memory use doesn’t grow with the table."""
+    with mk_session() as session, session.begin():
+        for obj in session.scalars(stmt.execution_options(yield_per=STREAM_BATCH_SIZE)):
+            yield pydantic_model.model_validate(obj).model_dump_json().encode() + b"\n"
+
+
+class BulkRowStatus(BaseModel):
+    id: str | int
+    status: Literal["created", "updated"]
+
+
+BULK_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "application/json": {"schema": {"type": "array", "items": {"type": "object"}}},
+        "application/x-ndjson": {"schema": {"type": "string"}},
+    },
+}
+
+
+async def get_bulk_rows(request: Request) -> list[Any]:
+    """Rows sent to a bulk endpoint, as a JSON array or as NDJSON."""
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            return [json.loads(line) for line in body.splitlines() if line.strip()]
+        rows = json.loads(body)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON: {e}") from e
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON array or NDJSON")
+    return rows
+
+
+def to_async_endpoint(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    """Async version of a sync endpoint, which runs it on the event loop with the sync view of an `AsyncSession`.
+
+    The endpoint’s `session` parameter becomes a `get_async_sess` dependency.
+    Its database calls are then awaited, so concurrent requests don’t queue for threads.
+    """
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    async def async_endpoint(*, session: AsyncSession, **kwargs: Any) -> Any:
+        return await session.run_sync(lambda sync_session: endpoint(**kwargs, session=sync_session))
+
+    sig = signature(endpoint)
+    params = [
+        p.replace(annotation=AsyncSession, default=Depends(get_async_sess)) if p.name == "session" else p for p in sig.parameters.values()
+    ]
+    async_endpoint.__signature__ = sig.replace(parameters=params)  # type: ignore[attr-defined]
+    async_endpoint.__name__ = endpoint.__name__
+    async_endpoint.__doc__ = endpoint.__doc__
+    return async_endpoint
+
+
+def register_model(router: APIRouter, table_name: str, model: type[Base], *, async_db: bool = False):
+    [pk] = inspect(model).primary_key
+    pk_type = pk.type.python_type
+    # `ndjson` responses are streamed from a separate sync session either way
+    endpoint = to_async_endpoint if async_db else lambda handler: handler
+    writer = get_writer(model)
+    patch_model = get_patch_model(model)
+
+    @router.get(
         f"/{table_name}",
         response_model=list[model.__pydantic__],
         summary=f"Get all {table_name}s",
+        description=(
+            "Paginated by ID. If there are more rows, the `Link` header points to the next page. "
+            f"With `format=ndjson`, rows are streamed instead. {FILTERS_DESCRIPTION}"
+        ),
     )
-    def _get_all(session: Session = Depends(get_sess)):
+    @endpoint
+    def _get_all(
+        request: Request,
+        response: Response,
+        limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE, description=f"Defaults to {DEFAULT_PAGE_SIZE}, or all rows for NDJSON"),
+        after: pk_type | None = Query(None, description="Only return rows with an ID after this one"),
+        total: bool = Query(False, description="Add the total number of rows as `X-Total-Count` header"),
+        fields: str | None = Query(None, description=FIELDS_DESCRIPTION),
+        expand: str | None = Query(None, description=EXPAND_DESCRIPTION),
+        format: Literal["json", "ndjson"] = Query("json", description="`ndjson` streams one row per line"),
+        session: Session = Depends(get_read_sess),
+    ):
+        fieldset = Fieldset.parse(model, fields, expand)
+        filters = Filters.parse(model, request.query_params, exclude=COLLECTION_PARAMS)
+        options = get_loader_options(model) if fieldset is None else fieldset.get_loader_options()
+        stmt = select(model).options(*options).where(*filters.clauses).order_by(pk)
+        if after is not None:
+            stmt = stmt.where(pk > after)
+        tables = (get_model_tables(model) if fieldset is None else fieldset.get_tables()) | filters.tables
+
+        if format == "ndjson":
+            with session.begin():
+                etag = get_etag(get_versions(session, tables))
+            if not_modified := check_not_modified(request, etag):
+                return not_modified
+            if limit is not None:
+                stmt = stmt.limit(limit)
+            # not `session`, which is closed before the response is sent
+            rows = stream_ndjson(request.app.state.mk_read_session, stmt, get_pydantic_model(model, fieldset))
+            return StreamingResponse(rows, media_type="application/x-ndjson", headers={"ETag": etag})
+
+        page_size = DEFAULT_PAGE_SIZE if limit is None else limit
+
+        def render() -> bytes:
+            data = session.scalars(stmt.limit(page_size + 1)).all()  # one more to know if there is a next page
+            if len(data) > page_size:
+                data = data[:page_size]
+                next_url = request.url.include_query_params(after=getattr(data[-1], pk.key))
+                response.headers["Link"] = f'<{next_url}>; rel="next"'
+            if total:
+                response.headers["X-Total-Count"] = str(session.scalar(select(func.count()).select_from(model).where(*filters.clauses)))
+            return dump_json(model, fieldset, data)
+
         with session.begin():
-            data = session.query(model).all()
-            return [model.__pydantic__.model_validate(d) for d in data]
+            return cached_get(request, response, session, tables, render)
 
-    @app.get(
+    @router.get(
         f"/{table_name}/{{id}}",
         response_model=model.__pydantic__,
         summary=f"Get a {table_name} by ID",
     )
-    def _get_by_id(id: str | int, session: Session = Depends(get_sess)):
-        with session.begin():
-            item = session.get(model, id)
+    @endpoint
+    def _get_by_id(
+        id: str | int,
+        request: Request,
+        response: Response,
+        fields: str | None = Query(None, description=FIELDS_DESCRIPTION),
+        expand: str | None = Query(None, description=EXPAND_DESCRIPTION),
+        session: Session = Depends(get_read_sess),
+    ):
+        fieldset = Fieldset.parse(model, fields, expand)
+
+        def render() -> bytes:
+            options = get_loader_options(model) if fieldset is None else fieldset.get_loader_options()
+            item = session.get(model, id, options=options)
             if item is None:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No {table_name} with ID {id}")
-            return model.__pydantic__.model_validate(item)
+            return dump_json(model, fieldset, item)
+
+        with session.begin():
+            tables = get_model_tables(model) if fieldset is None else fieldset.get_tables()
+            return cached_get(request, response, session, tables, render)
 
-    # TODO: allow many?
-    @app.post(
+    @router.post(
+        f"/{table_name}/_bulk",
+        response_model=list[BulkRowStatus],
+        summary=f"Create or update many {table_name}s",
+        description=(
+            "Takes a JSON array or NDJSON (`application/x-ndjson`) of rows. "
+            "Existing rows only need their ID and the fields to change. All rows are written in one transaction. "
+            "Many-to-many lists replace the links of a row; one-to-many lists add to its children, without unlinking the others."
+        ),
+        openapi_extra={"requestBody": BULK_REQUEST_BODY},
+    )
+    @endpoint
+    def _bulk(rows: list[Any] = Depends(get_bulk_rows), session: Session = Depends(get_sess)):
+        with session.begin():
+            try:
+                result = bulk_load(rows, model, session=session, partial=True)
+            except ValidationError as e:
+                raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors()], body=rows) from e
+            bump_versions(session, result.tables)
+        return [
+            BulkRowStatus(id=id, status="created" if created else "updated") for id, created in zip(result.ids, result.created, strict=True)
+        ]
+
+    @router.post(
         f"/{table_name}",
         response_model=model.__pydantic__,
         summary=f"Create a {table_name}",
         status_code=status.HTTP_201_CREATED,
     )
+    @endpoint
     def _create(
         data: model.__pydantic_put__,
         session: Session = Depends(get_sess),
     ):
         with session.begin():
-            serializer = model.__marshmallow__(session=session)
-            item: Base = serializer.load(data.model_dump())
-            session.add(item)
+            item = writer.create(session, data.model_dump())
             session.flush()
-            resp = model.__pydantic__.model_validate(item)
+            resp = json_response(dump_json(model, None, item), status.HTTP_201_CREATED)
             session.commit()
         return resp
 
-    @app.put(
+    @router.put(
         f"/{table_name}/{{id}}",
         response_model=model.__pydantic__,
         summary=f"Add or Update a {table_name}",
         status_code=status.HTTP_200_OK,
     )
+    @endpoint
     def _put(
         id: str | int,
         data: model.__pydantic_put__,  # NB: cannot use PUT for `IdMixin`-derived models
@@ -121,39 +463,35 @@ def register_model(table_name: str, model: type[Base]):
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"routing ID {id} does not match ID in data {data.id}")
             # https://docs.sqlalchemy.org/en/20/orm/contextual.html#sqlalchemy.orm.scoped_session.get
             if item := session.get(model, id):
-                update_model(model, item, data.model_dump(), session)
+                writer.update(session, item, data.model_dump())
             else:
-                item = model(**data.model_dump())
+                item = writer.create(session, data.model_dump())
                 response.status_code = status.HTTP_201_CREATED
-            session.add(item)
             session.flush()
-            resp = model.__pydantic__.model_validate(item)
+            resp = json_response(dump_json(model, None, item), response.status_code or status.HTTP_200_OK)
             session.commit()
         return resp
 
-    @app.patch(
+    @router.patch(
         f"/{table_name}/{{id}}",
         response_model=model.__pydantic__,
         status_code=status.HTTP_200_OK,
         summary=f"Update a {table_name}",
     )
+    @endpoint
     def _patch(
         id: str | int,
-        data: dict[str, Any],
+        data: patch_model,  # only the fields to change
         session: Session = Depends(get_sess),
     ):
         with session.begin():
             if not (item := session.get(model, id)):
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No {table_name} with ID {id}")
-
-            update_model(model, item, {**data, "id": id}, session)
-            session.add(item)
+            writer.update(session, item, data.model_dump(exclude_unset=True))
             session.flush()
-            resp = model.__pydantic__.model_validate(item)
+            resp = json_response(dump_json(model, None, item))
             session.commit()
         return resp
 
 
-table_name2model = init_db()
-for table_name, model in table_name2model.items():
-    register_model(table_name, model)
+app = create_app()
@@ -5,3 +5,40 @@ from platformdirs import user_cache_path
 DEBUG = os.environ.get("DEBUG", "").lower() not in {"", "0", "false"}
 
 CACHE_DIR = user_cache_path("boh_app")
+
+# set by the `api` command after initializing the database, so its workers skip that step
+DB_INITIALIZED_ENV = "BOH_APP_DB_INITIALIZED"
+
+# PRAGMAs of SQLite connections and size of the connection pool, see `boh_app.database.StorageProfile`
+SQLITE_JOURNAL_MODE = os.environ.get("BOH_APP_SQLITE_JOURNAL_MODE", "WAL").upper()
+SQLITE_SYNCHRONOUS = os.environ.get("BOH_APP_SQLITE_SYNCHRONOUS", "NORMAL").upper()
+SQLITE_MMAP_SIZE = int(os.environ.get("BOH_APP_SQLITE_MMAP_SIZE", 256 * 2**20))
+SQLITE_CACHE_SIZE = int(os.environ.get("BOH_APP_SQLITE_CACHE_SIZE", -32 * 2**10))
+SQLITE_TEMP_STORE = os.environ.get("BOH_APP_SQLITE_TEMP_STORE", "MEMORY").upper()
+SQLITE_BUSY_TIMEOUT = int(os.environ.get("BOH_APP_SQLITE_BUSY_TIMEOUT", 5000))
+DB_POOL_SIZE = int(os.environ.get("BOH_APP_DB_POOL_SIZE", 8))
+DB_MAX_OVERFLOW = int(os.environ.get("BOH_APP_DB_MAX_OVERFLOW", 32))
+
+# upper bound for the in-process cache of GET responses
+RESPONSE_CACHE_BYTES = int(os.environ.get("BOH_APP_RESPONSE_CACHE_BYTES", 64 * 2**20))
+
+# serve the REST endpoints from the event loop with an aiosqlite engine, instead of from a thread pool
+ASYNC_DB = os.environ.get("BOH_APP_ASYNC_DB", "").lower() not in {"", "0", "false"}
+
+# threads executing GraphQL operations
+GRAPHQL_THREADS = int(os.environ.get("BOH_APP_GRAPHQL_THREADS", 8))
+
+# upper bound for the in-process cache of GraphQL query results
+GRAPHQL_CACHE_BYTES = int(os.environ.get("BOH_APP_GRAPHQL_CACHE_BYTES", 32 * 2**20))
+
+# parsed GraphQL documents cached besides the persisted ones
+GRAPHQL_DOCUMENT_CACHE_SIZE = int(os.environ.get("BOH_APP_GRAPHQL_DOCUMENT_CACHE_SIZE", 256))
+
+# reject GraphQL documents that aren’t persisted queries of the frontend
+PERSISTED_QUERIES_ONLY = os.environ.get("BOH_APP_PERSISTED_QUERIES_ONLY", "").lower() not in {"", "0", "false"}
+
+# limits for GraphQL operations, see `boh_app.graphql_cost`
+GRAPHQL_MAX_DEPTH = int(os.environ.get("BOH_APP_GRAPHQL_MAX_DEPTH", 8))
+GRAPHQL_MAX_COST = int(os.environ.get("BOH_APP_GRAPHQL_MAX_COST", 100_000))
+# seconds between checks whether the row counts behind the cost estimates are outdated
+GRAPHQL_COST_STATS_TTL = float(os.environ.get("BOH_APP_GRAPHQL_COST_STATS_TTL", 60))
@@ -8,13 +8,13 @@ from sqlalchemy.orm import Session
 
 
 def gql_query(src: LiteralString, *, db_session: Session | None = None) -> dict[str, Any]:
-    from .database import SessionLocal
-    from .graphql import gql_schema
+    from .database import SessionLocal, get_engine
+    from .graphql import get_context, get_gql_schema
 
     if oneshot_session := (db_session is None):
-        db_session = SessionLocal()
+        db_session = SessionLocal(bind=get_engine())
     with db_session.begin():
-        result = graphql_sync(gql_schema, src, context_value={"session": db_session})
+        result = graphql_sync(get_gql_schema(), src, context_value=get_context(db_session))
     if oneshot_session:
         db_session.close()
 
@@ -0,0 +1,111 @@
+"""
+Per-table version counters, for ETags on the REST getters.
+
+Every flush that writes ORM objects bumps the versions of the tables it changed, and `load_all` bumps the tables it reloads.
+The counters live in the database, so all server processes see each other’s writes.
+"""
+
+from collections.abc import Collection, Iterable
+from functools import cache
+from hashlib import sha256
+from time import time_ns
+from typing import Any
+
+from pydantic import BaseModel
+from sqlalchemy import Table, event, inspect, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Mapper, ORMExecuteState, RelationshipDirection, Session
+
+from .loading import get_nested_models
+from .models import Base, table_version
+
+# key in `Session.info` for the tables changed in the current transaction
+CHANGED_TABLES_KEY = "changed_tables"
+
+
+def bump_versions(session: Session, table_names: Iterable[str]) -> None:
+    """Bump the versions of `table_names`, and remember them as changed until the transaction ends."""
+    if not (table_names := sorted(set(table_names))):
+        return
+    # start from the current time instead of 1, so a recreated database doesn’t repeat the versions of the one before
+    stmt = insert(table_version).values([{"table_name": name, "version": time_ns()} for name in table_names])
+    stmt = stmt.on_conflict_do_update(index_elements=[table_version.c.table_name], set_={"version": table_version.c.version + 1})
+    session.connection().execute(stmt)
+    session.info.setdefault(CHANGED_TABLES_KEY, set()).update(table_names)
+
+
+def get_versions(session: Session, table_names: Collection[str]) -> dict[str, int]:
+    rows = session.execute(select(table_version.c.table_name, table_version.c.version).where(table_version.c.table_name.in_(table_names)))
+    return dict(rows.tuples().all())
+
+
+def get_etag(versions: dict[str, int]) -> str:
+    digest = sha256(repr(sorted(versions.items())).encode())
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an `If-None-Match` header matches `etag`, using weak comparison as HTTP requires for it."""
+    if if_none_match is None:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+@cache
+def get_model_tables(model: type[Base]) -> frozenset[str]:
+    """Names of the tables whose content ends up in `model.__pydantic__`."""
+    return frozenset(get_read_tables(inspect(model), model.__pydantic__))
+
+
+def get_read_tables(mapper: Mapper, pydantic_model: type[BaseModel], path: frozenset[type] = frozenset()) -> set[str]:
+    """Names of the tables whose content ends up in `pydantic_model` when validated from an object of `mapper`."""
+    path = path | {pydantic_model}
+    tables = {mapper.local_table.name}
+    for name, field in pydantic_model.model_fields.items():
+        if (rel := mapper.relationships.get(name)) is None:
+            continue
+        tables |= get_relationship_tables(mapper, name)
+        for nested in get_nested_models(field.annotation):
+            if issubclass(nested, BaseModel) and nested not in path:
+                tables |= get_read_tables(rel.mapper, nested, path)
+    return tables
+
+
+def get_relationship_tables(mapper: Mapper, name: str) -> set[str]:
+    rel = mapper.relationships[name]
+    tables = {rel.mapper.local_table.name}
+    if isinstance(rel.secondary, Table):
+        tables.add(rel.secondary.name)
+    return tables
+
+
+def get_changed_tables(session: Session) -> set[str]:
+    """Names of the tables that the pending changes of `session` write to."""
+    tables = set()
+    for obj in [*session.new, *session.dirty, *session.deleted]:
+        state = inspect(obj)
+        if obj not in session.dirty or session.is_modified(obj, include_collections=False):
+            tables.add(state.mapper.local_table.name)
+        for rel in state.mapper.relationships:
+            if obj not in session.deleted and not state.attrs[rel.key].history.has_changes():
+                continue
+            if isinstance(rel.secondary, Table):
+                tables.add(rel.secondary.name)
+            elif rel.direction is RelationshipDirection.ONETOMANY:
+                tables.add(rel.mapper.local_table.name)  # children get their foreign keys updated
+    return tables
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_flushed(session: Session, _flush_context: Any) -> None:
+    # `session.new`, `.dirty` and `.deleted` still show the state before the flush
+    bump_versions(session, get_changed_tables(session))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bump_executed(orm_execute_state: ORMExecuteState) -> None:
+    """Bump tables written by ORM-enabled `insert`, `update` and `delete` statements."""
+    state = orm_execute_state
+    if state.is_orm_statement and (state.is_insert or state.is_update or state.is_delete):
+        bump_versions(state.session, [mapper.local_table.name for mapper in state.all_mappers])
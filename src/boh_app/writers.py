@@ -0,0 +1,107 @@
+"""
+Writing validated `__pydantic_put__` payloads to ORM objects.
+
+The marshmallow schemas load a payload into a throwaway object, looking up every related object on its own.
+A `Writer` is built once per model from its mapper instead. It sets the payload’s columns on the target object directly,
+and fetches the related objects that the payload refers to with one `SELECT … IN` per related model.
+"""
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from functools import cache
+from typing import Any
+
+from pydantic import BaseModel, create_model
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import RelationshipProperty, Session
+
+from .models import Base
+
+
+@dataclass(frozen=True)
+class Writer:
+    model: type[Base]
+    pk: str
+    columns: frozenset[str]  # columns in the payload
+    relationships: dict[str, RelationshipProperty]  # relationships in the payload
+
+    @classmethod
+    def build(cls, model: type[Base]) -> "Writer":
+        mapper = inspect(model)
+        [pk] = mapper.primary_key
+        fields = model.__pydantic_put__.model_fields
+        columns = frozenset(attr.key for attr in mapper.column_attrs if attr.key in fields and attr.key != pk.key)
+        relationships = {name: rel for name, rel in mapper.relationships.items() if name in fields}
+        return cls(model, pk.key, columns, relationships)
+
+    def create(self, session: Session, data: dict[str, Any]) -> Base:
+        """Add a new object with the content of `data`."""
+        item = self.model()
+        if (id_ := data.get(self.pk)) is not None:
+            setattr(item, self.pk, id_)
+        self.update(session, item, data)
+        session.add(item)
+        return item
+
+    def update(self, session: Session, item: Base, data: dict[str, Any]) -> Base:
+        """Set the columns and relationships in `data` on `item`. Its primary key stays the same."""
+        for key in self.columns.intersection(data):
+            setattr(item, key, data[key])
+        related = self.get_related(session, data)
+        for key in self.relationships.keys() & data.keys():
+            rel = self.relationships[key]
+            lookup = related[rel.mapper.class_]
+            value = data[key]
+            if rel.uselist:
+                setattr(item, key, [lookup.get(rel, ref) for ref in value])
+            else:
+                setattr(item, key, None if value is None else lookup.get(rel, value))
+        return item
+
+    def get_related(self, session: Session, data: dict[str, Any]) -> dict[type[Base], "RelatedObjects"]:
+        """Objects that the relationships in `data` refer to, by model."""
+        refs: dict[type[Base], list[dict[str, Any]]] = {}
+        for key in self.relationships.keys() & data.keys():
+            rel = self.relationships[key]
+            refs.setdefault(rel.mapper.class_, []).extend(iter_refs(data[key]))
+        return {model: RelatedObjects.fetch(session, model, model_refs) for model, model_refs in refs.items()}
+
+
+@dataclass
+class RelatedObjects:
+    pk: str
+    objects: dict[Any, Base]
+
+    @classmethod
+    def fetch(cls, session: Session, model: type[Base], refs: list[dict[str, Any]]) -> "RelatedObjects":
+        [pk] = inspect(model).primary_key
+        ids = {id_ for ref in refs if (id_ := ref.get(pk.key)) is not None}
+        objects = {getattr(obj, pk.key): obj for obj in session.scalars(select(model).where(pk.in_(ids)))} if ids else {}
+        return cls(pk.key, objects)
+
+    def get(self, rel: RelationshipProperty, ref: dict[str, Any]) -> Base:
+        """The object `ref` refers to. Like marshmallow’s `Related` field, a new one is created if there is none."""
+        if (id_ := ref.get(self.pk)) is None:
+            return rel.mapper.class_(**ref)
+        if (obj := self.objects.get(id_)) is None:
+            obj = self.objects[id_] = rel.mapper.class_(**ref)  # refer to the same new object every time
+        return obj
+
+
+def iter_refs(value: dict[str, Any] | list[dict[str, Any]] | None) -> Iterable[dict[str, Any]]:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+@cache
+def get_writer(model: type[Base]) -> Writer:
+    return Writer.build(model)
+
+
+@cache
+def get_patch_model(model: type[Base]) -> type[BaseModel]:
+    """`model.__pydantic_put__` with every field optional, for partial updates dumped with `exclude_unset=True`."""
+    put_model = model.__pydantic_put__
+    fields: dict[str, Any] = {name: (field.annotation, None) for name, field in put_model.model_fields.items()}
+    return create_model(f"{model.__name__}PatchModel", __config__=put_model.model_config, **fields)
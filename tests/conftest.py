@@ -1,5 +1,7 @@
+import json
 from collections.abc import Generator
 from pathlib import Path
+from typing import Any
 
 import pytest
 from fastapi.testclient import TestClient
@@ -7,14 +9,96 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import Session, sessionmaker
 
 from boh_app.database import init_db
-from boh_app.server import get_sess
+from boh_app.server import create_app, get_read_sess, get_sess
+
+# small stand-in for the files `gen-all` writes to `CACHE_DIR`, shaped like the generators’ output
+GENERATED_DATA: dict[str, list[dict[str, Any]]] = {
+    "skill": [
+        {
+            "id": "s.anbary",
+            "name": "Anbary & Lapidary",
+            "primary_principle": "sky",
+            "secondary_principle": "forge",
+            "wisdoms": [{"id": "Horomachistry"}, {"id": "Ithastry"}],
+        },
+        {
+            "id": "s.bells",
+            "name": "Bells & Brazieries",
+            "primary_principle": "lantern",
+            "secondary_principle": "sky",
+            "wisdoms": [{"id": "Illumination"}, {"id": "Horomachistry"}],
+        },
+    ],
+    "item": [
+        {"id": "amber", "name": "Amber", "aspects": [{"id": "gem"}], "heart": 2, "lantern": 1},
+        {"id": "brass", "name": "Brass Plate", "aspects": [{"id": "metal"}, {"id": "tool"}], "forge": 2, "known": True},
+        {"id": "candle", "name": "Candle", "aspects": [{"id": "light"}, {"id": "fuel"}], "lantern": 2},
+        {"id": "lamp", "name": "Lamp", "aspects": [{"id": "light"}, {"id": "tool"}], "lantern": 4, "forge": 1},
+        {"id": "t.book", "name": "A Book"},
+    ],
+    "recipe": [
+        {
+            "id": "lamp_lantern_brass",
+            "product": {"id": "lamp"},
+            "source_item": {"id": "brass"},
+            "principle": "lantern",
+            "principle_amount": 5,
+            "crafting_action": "craft",
+            "skills": [{"id": "s.bells"}],
+            "recipe_internals": [{"id": "craft.lamp.bells"}],
+        },
+        {
+            "id": "candle_forge_fuel",
+            "product": {"id": "candle"},
+            "source_aspect": {"id": "fuel"},
+            "principle": "forge",
+            "principle_amount": 3,
+            "crafting_action": "craft",
+            "skills": [{"id": "s.anbary"}, {"id": "s.bells"}],
+            "recipe_internals": [{"id": "craft.candle.anbary"}, {"id": "craft.candle.bells"}],
+        },
+        {"id": "t.book", "product": {"id": "amber"}, "principle": "heart", "principle_amount": 6, "crafting_action": "read"},
+    ],
+    "workstation_slot": [
+        {"id": "Tool", "name": "Tool", "index": 1, "accepts": [{"id": "tool"}]},
+        {"id": "Light", "name": "Light", "index": 2, "accepts": [{"id": "light"}, {"id": "fuel"}]},
+    ],
+    "workstation": [
+        {
+            "id": "Workbench",
+            "principles": ["forge", "lantern"],
+            "workstation_type": {"id": "workbench"},
+            "workstation_slots": [{"id": "Tool", "name": "Tool", "index": 1}, {"id": "Light", "name": "Light", "index": 2}],
+            "evolves": {"id": "Illumination"},
+        },
+        {
+            "id": "Desk",
+            "principles": ["moth"],
+            "workstation_type": {"id": "desk"},
+            "workstation_slots": [{"id": "Tool", "name": "Tool", "index": 0}],
+        },
+    ],
+}
+
+
+@pytest.fixture
+def generated_data(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Make `load_all` pick up `GENERATED_DATA`. Request it before `db_session`."""
+    from boh_app.data import load_data
+
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    for name, data in GENERATED_DATA.items():
+        (cache_dir / f"{name}.json").write_text(json.dumps(data))
+    monkeypatch.setattr(load_data, "CACHE_DIR", cache_dir)
+    return cache_dir
 
 
 @pytest.fixture
 def db_session(tmp_path: Path) -> Generator[Session, None, None]:
     test_engine = create_engine(f"sqlite+pysqlite:///{tmp_path}/db.sqlite")
     SessionTest = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
-    init_db(engine=test_engine, mk_session=SessionTest)
+    init_db(engine=test_engine, mk_session=SessionTest, snapshot=None)
 
     db_session = SessionTest()
     try:
@@ -24,16 +108,13 @@ def db_session(tmp_path: Path) -> Generator[Session, None, None]:
 
 
 @pytest.fixture
-def client(db_session) -> Generator[TestClient, None, None]:
-    from boh_app.server import app
-
-    client = TestClient(app)
+def client(db_session: Session) -> Generator[TestClient, None, None]:
+    app = create_app(engine=db_session.get_bind(), snapshot=None)
 
     def get_test_sess():
         yield db_session
 
     app.dependency_overrides[get_sess] = get_test_sess
-    try:
+    app.dependency_overrides[get_read_sess] = get_test_sess
+    with TestClient(app) as client:
         yield client
-    finally:
-        app.dependency_overrides.clear()
@@ -1,9 +1,14 @@
+import json
+from collections.abc import Generator
 from typing import Any
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
 
 from boh_app import models
+from boh_app.server import create_app
 
 
 def get_loaded_data(data: dict[str, Any], model: type[models.Base]) -> dict[str, Any]:
@@ -88,7 +93,6 @@ def test_patch_404(client: TestClient):
     assert result.json() == {"detail": "No aspect with ID test_value"}
 
 
-@pytest.mark.xfail(reason="Never actually worked, as serializers req most fields, except when they have db defaults")
 def test_patch_field(client: TestClient, skill_test_data: dict[str, Any]):
     og_skill_data = skill_test_data
 
@@ -99,7 +103,6 @@ def test_patch_field(client: TestClient, skill_test_data: dict[str, Any]):
     assert result.json() == get_loaded_data(updated_data, models.Skill)
 
 
-@pytest.mark.xfail(reason="Never actually worked, as serializers req most fields, except when they have db defaults")
 def test_patch_fk(client: TestClient, skill_test_data: dict[str, Any]):
     og_skill_data = skill_test_data
     new_data = {"primary_principle": "edge"}
@@ -109,3 +112,320 @@ def test_patch_fk(client: TestClient, skill_test_data: dict[str, Any]):
     result = client.patch(f"/skill/{og_skill_data['id']}", json=new_data)
     assert result.status_code == 200, result.json()
     assert result.json() == get_loaded_data(updated_data, models.Skill)
+
+
+def test_patch_relationship(client: TestClient, skill_test_data: dict[str, Any], statements: list[str]):
+    wisdoms = [{"id": "Horomachistry"}, {"id": "Birdsong"}]  # an existing and a new one
+    statements.clear()
+    result = client.patch(f"/skill/{skill_test_data['id']}", json={"wisdoms": wisdoms})
+    assert result.status_code == 200, result.json()
+    assert result.json() == get_loaded_data({**skill_test_data, "wisdoms": wisdoms}, models.Skill)
+    [lookup] = [s for s in statements if s.startswith("SELECT") and "FROM wisdom" in s and "skill_wisdom" not in s]
+    assert "IN" in lookup
+
+    result = client.patch(f"/skill/{skill_test_data['id']}", json={"level": None})
+    assert result.status_code == 422
+
+
+@pytest.fixture
+def statements(db_session: Session) -> Generator[list[str], None, None]:
+    """SQL statements executed while the test runs."""
+    executed: list[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, *_):
+        executed.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield executed
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.mark.parametrize("table_name", ["item", "recipe", "skill", "workstation", "workstation_slot"])
+@pytest.mark.usefixtures("generated_data")
+def test_get_eager(client: TestClient, statements: list[str], table_name: str):
+    """Getting rows loads their relationships in a bounded number of statements, not one per row."""
+    model = models.get_tablename_model_mapping()[table_name]
+    # the version lookup for the ETag, the row query, and at most one more for each serialized relationship
+    max_statements = 2 + len([name for name in model.__pydantic__.model_fields if name in inspect(model).relationships])
+
+    result = client.get(table_name)
+    assert result.status_code == 200, result.json()
+    assert len(result.json()) >= 2
+    assert len(statements) <= max_statements, statements
+
+    statements.clear()
+    result = client.get(f"{table_name}/{result.json()[0]['id']}")
+    assert result.status_code == 200, result.json()
+    assert len(statements) <= max_statements, statements
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_get_all_paginated(client: TestClient):
+    result = client.get("item", params={"limit": 2, "total": True})
+    assert result.headers["X-Total-Count"] == "5"
+    ids = [item["id"] for item in result.json()]
+    while "next" in result.links:
+        result = client.get(result.links["next"]["url"])
+        assert result.status_code == 200, result.json()
+        assert len(result.json()) <= 2
+        ids.extend(item["id"] for item in result.json())
+    assert ids == sorted(ids)
+    assert ids == [item["id"] for item in client.get("item").json()]
+
+
+def test_get_all_paginated_generated_id(client: TestClient):
+    for count in range(3):
+        assert client.post("principle_count", json={"principle": "edge", "count": count}).status_code == 201
+    [first, second] = client.get("principle_count", params={"limit": 2}).json()
+    assert client.get("principle_count", params={"after": first["id"]}).json()[0] == second
+    assert client.get("principle_count", params={"after": "dne"}).status_code == 422
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_get_fieldset(client: TestClient, statements: list[str]):
+    full = {item["id"]: item for item in client.get("item").json()}
+
+    statements.clear()
+    result = client.get("item", params={"fields": "name,known"})
+    assert result.status_code == 200, result.json()
+    assert result.json() == [{"id": id, "name": item["name"], "known": item["known"]} for id, item in full.items()]
+    [_version_lookup, statement] = statements
+    assert "edge" not in statement
+
+    statements.clear()
+    result = client.get("item/lamp", params={"fields": "is_craftable", "expand": "aspects"})
+    assert result.status_code == 200, result.json()
+    assert result.json() == {key: full["lamp"][key] for key in ["id", "is_craftable", "aspects"]}
+    assert len(statements) <= 4, statements  # versions, item, aspects, and recipes for is_craftable
+
+
+def test_hybrid_dependencies():
+    """Every hybrid property declares the mapped attributes it reads, for sparse fieldsets to load them."""
+    from sqlalchemy.ext.hybrid import hybrid_property
+
+    for model in models.get_tablename_model_mapping().values():
+        for name, attr in vars(model).items():
+            if isinstance(attr, hybrid_property):
+                dependencies = attr.info.get(models.HYBRID_DEPENDENCIES)
+                assert dependencies, f"{model.__name__}.{name} has no `depends_on`"
+                assert dependencies <= set(inspect(model).attrs.keys()), f"{model.__name__}.{name}"
+
+
+def test_get_fieldset_unknown(client: TestClient):
+    result = client.get("item", params={"fields": "name,dne"})
+    assert result.status_code == 400
+    assert result.json() == {"detail": "Unknown fields: dne"}
+    result = client.get("item", params={"expand": "name"})
+    assert result.status_code == 400
+    assert result.json() == {"detail": "Unknown relationships: name"}
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_get_filtered(client: TestClient, statements: list[str]):
+    def ids(table: str, params: dict[str, Any] | list[tuple[str, str]]) -> list[str]:
+        result = client.get(table, params=params)
+        assert result.status_code == 200, result.json()
+        return [row["id"] for row in result.json()]
+
+    statements.clear()
+    assert ids("item", {"lantern__gte": 2, "fields": "name"}) == ["candle", "lamp"]
+    [_version_lookup, statement] = statements
+    assert "item.lantern >=" in statement
+    assert ids("item", {"lantern__gte": 2, "forge__gt": 0}) == ["lamp"]
+    assert ids("item", {"known": "true"}) == ["brass"]
+    assert ids("item", [("aspect", "tool"), ("aspect", "gem")]) == ["amber", "brass", "lamp"]
+    assert ids("item", [("principle", "heart"), ("principle", "forge")]) == ["amber", "brass", "lamp"]
+    assert ids("skill", {"principle": "lantern"}) == ["s.bells"]
+    assert ids("skill", {"principle": "sky"}) == ["s.anbary", "s.bells"]
+    assert ids("recipe", {"principle": "forge"}) == ["candle_forge_fuel"]
+    assert ids("workstation", {"principle": "moth"}) == ["Desk"]
+    assert ids("workstation_slot", {"aspect": "fuel"}) == ["Light"]
+
+    result = client.get("item", params={"aspect": "light", "limit": 1, "total": True})
+    assert [row["id"] for row in result.json()] == ["candle"]
+    assert result.headers["X-Total-Count"] == "2"
+    assert "aspect=light" in result.headers["Link"]
+
+
+def test_get_filtered_invalid(client: TestClient):
+    result = client.get("item", params={"dne": 1, "name__gte": "a"})
+    assert result.status_code == 400
+    assert result.json() == {"detail": "Unknown filters: dne, name__gte"}
+    result = client.get("item", params={"lantern__gte": "many"})
+    assert result.status_code == 400
+    assert result.json() == {"detail": "Invalid value for lantern__gte: 'many'"}
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_get_not_modified(client: TestClient, statements: list[str]):
+    result = client.get("recipe")
+    etag = result.headers["ETag"]
+    item_etag = client.get("item/lamp").headers["ETag"]
+
+    statements.clear()
+    result = client.get("recipe", headers={"If-None-Match": etag})
+    assert result.status_code == 304
+    assert result.headers["ETag"] == etag
+    assert len(statements) == 1  # only the version lookup
+
+    # recipes embed skills, items don’t
+    skill = client.get("skill/s.bells").json()
+    assert client.put("skill/s.bells", json={**skill, "level": 2}).status_code == 200
+    result = client.get("recipe", headers={"If-None-Match": etag})
+    assert result.status_code == 200
+    assert result.headers["ETag"] != etag
+    assert client.get("item/lamp", headers={"If-None-Match": item_etag}).status_code == 304
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_bulk(client: TestClient):
+    etag = client.get("item/candle").headers["ETag"]
+    rows = [{"id": "candle", "known": True}, {"id": "mirror", "name": "Mirror", "aspects": [{"id": "light"}]}]
+    result = client.post("item/_bulk", json=rows)
+    assert result.status_code == 200, result.json()
+    assert result.json() == [{"id": "candle", "status": "updated"}, {"id": "mirror", "status": "created"}]
+
+    candle = client.get("item/candle", headers={"If-None-Match": etag})
+    assert candle.status_code == 200
+    assert candle.json()["known"] is True
+    assert candle.json()["name"] == "Candle"
+    assert [a["id"] for a in client.get("item/mirror").json()["aspects"]] == ["light"]
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_bulk_repeated_id(client: TestClient, statements: list[str]):
+    """Only the IDs in the payload are looked up, and a repeated one updates the row its first occurrence creates."""
+    rows = [{"id": "mirror", "name": "Mirror"}, {"id": "mirror", "known": True}]
+    statements.clear()
+    result = client.post("item/_bulk", json=rows)
+    assert result.status_code == 200, result.json()
+    assert result.json() == [{"id": "mirror", "status": "created"}, {"id": "mirror", "status": "updated"}]
+    assert any(statement.startswith("SELECT item.id") and " IN " in statement for statement in statements), statements
+
+    mirror = client.get("item/mirror").json()
+    assert (mirror["name"], mirror["known"]) == ("Mirror", True)
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_bulk_ndjson(client: TestClient):
+    content = '{"id": "s.anbary", "level": 2}\n{"id": "s.bells", "level": 3}\n'
+    result = client.post("skill/_bulk", content=content, headers={"Content-Type": "application/x-ndjson"})
+    assert result.status_code == 200, result.json()
+    assert [s["level"] for s in client.get("skill").json()] == [2, 3]
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_bulk_invalid(client: TestClient):
+    rows = [{"id": "candle", "known": True}, {"id": "mirror"}]
+    result = client.post("item/_bulk", json=rows)
+    assert result.status_code == 422
+    assert [error["loc"] for error in result.json()["detail"]] == [["body", 1, "name"]]
+    assert client.get("item/candle").json()["known"] is False  # all or nothing
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_bulk_references(client: TestClient):
+    """Missing rows that only need an ID are created for references to them, like the other endpoints do."""
+    result = client.post("item/_bulk", json=[{"id": "mirror", "name": "Mirror", "aspects": [{"id": "light"}, {"id": "reflection"}]}])
+    assert result.status_code == 200, result.json()
+    assert client.get("aspect/reflection").status_code == 200
+    assert sorted(a["id"] for a in client.get("item/mirror").json()["aspects"]) == ["light", "reflection"]
+
+    new_recipe = {"principle": "lantern", "principle_amount": 5, "crafting_action": "craft"}
+    rows = [
+        {"id": "t.book", "product": {"id": "dne"}},
+        {"id": "mirror_craft", "product": {"id": "mirror"}, "source_item": {"id": "dne"}, **new_recipe},
+    ]
+    result = client.post("recipe/_bulk", json=rows)
+    assert result.status_code == 422
+    assert [error["loc"] for error in result.json()["detail"]] == [["body", 0, "product"], ["body", 1, "source_item"]]
+    assert client.get("recipe/t.book").json()["product"]["id"] == "amber"
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_bulk_children(client: TestClient):
+    """Missing children are created if they only need their ID and parent, and children left out stay linked."""
+    result = client.post("item/_bulk", json=[{"id": "candle", "source_recipe": [{"id": "newrecipe"}]}])
+    assert result.status_code == 422
+    [error] = result.json()["detail"]
+    assert (error["type"], error["loc"]) == ("missing_reference", ["body", 0, "source_recipe", 0])
+
+    rows = [{"id": "lamp_lantern_brass", "recipe_internals": [{"id": "craft.lamp.new"}]}]
+    result = client.post("recipe/_bulk", json=rows)
+    assert result.status_code == 200, result.json()
+    internals = client.get("recipe/lamp_lantern_brass").json()["recipe_internals"]
+    assert sorted(internal["id"] for internal in internals) == ["craft.lamp.bells", "craft.lamp.new"]
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_bulk_null(client: TestClient):
+    """Columns that existing rows may omit still can’t be null."""
+    rows = [{"id": "candle", "name": None}, {"id": "mirror", "name": "Mirror", "known": None}]
+    result = client.post("item/_bulk", json=rows)
+    assert result.status_code == 422
+    assert [error["loc"] for error in result.json()["detail"]] == [["body", 0, "name"], ["body", 1, "known"]]
+    result = client.post("recipe/_bulk", json=[{"id": "t.book", "product": None}])
+    assert result.status_code == 422
+    assert [error["loc"] for error in result.json()["detail"]] == [["body", 0, "product"]]
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_patch_batch(client: TestClient):
+    operations = [
+        {"table": "item", "id": "candle", "patch": {"known": True}},
+        {"table": "skill", "id": "s.bells", "patch": {"level": 2, "committed": True}},
+    ]
+    result = client.patch("_batch", json=operations)
+    assert result.status_code == 200, result.json()
+    [candle, bells] = result.json()
+    assert (candle["known"], candle["name"]) == (True, "Candle")
+    assert (bells["level"], bells["committed"]) == (2, True)
+    assert [w["id"] for w in client.get("skill/s.bells").json()["wisdoms"]] == [w["id"] for w in bells["wisdoms"]]
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_patch_batch_atomic(client: TestClient):
+    operations = [
+        {"table": "item", "id": "candle", "patch": {"known": True}},
+        {"table": "skill", "id": "dne", "patch": {"level": 2}},
+    ]
+    result = client.patch("_batch", json=operations)
+    assert result.status_code == 404
+    assert result.json() == {"detail": "Operation 1: no skill with ID dne"}
+    assert client.get("item/candle").json()["known"] is False
+
+    operations[1] = {"table": "skill", "id": "s.bells", "patch": {"level": "high"}}
+    result = client.patch("_batch", json=operations)
+    assert result.status_code == 422
+    assert result.json()["detail"]["operation"] == 1
+    assert client.get("item/candle").json()["known"] is False
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_get_all_ndjson(client: TestClient):
+    params = {"format": "ndjson", "fields": "name", "after": "amber"}
+    with client.stream("GET", "item", params=params) as result:
+        assert result.status_code == 200
+        assert result.headers["Content-Type"] == "application/x-ndjson"
+        lines = list(result.iter_lines())
+    expected = client.get("item", params={"fields": "name", "after": "amber"}).json()
+    assert [json.loads(line) for line in lines] == expected
+
+    result = client.get("item", params=params, headers={"If-None-Match": result.headers["ETag"]})
+    assert result.status_code == 304
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_async_db(db_session: Session):
+    with TestClient(create_app(engine=db_session.get_bind(), snapshot=None, async_db=True)) as client:
+        assert [item["id"] for item in client.get("item", params={"aspect": "light"}).json()] == ["candle", "lamp"]
+        assert client.get("item/dne").status_code == 404
+        lamp = client.get("item/lamp")
+        assert client.get("item/lamp", headers={"If-None-Match": lamp.headers["ETag"]}).status_code == 304
+
+        result = client.put("item/lamp", json={**lamp.json(), "known": True})
+        assert result.status_code == 200, result.json()
+        assert client.get("item/lamp").json()["known"] is True
+        assert client.post("item/_bulk", json=[{"id": "lamp", "known": False}]).json() == [{"id": "lamp", "status": "updated"}]
+        assert client.get("item/lamp").json()["known"] is False
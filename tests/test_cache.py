@@ -0,0 +1,83 @@
+import pytest
+from fastapi.testclient import TestClient
+from graphql import parse
+
+from boh_app.cache import CachedResponse, ResponseCache
+from boh_app.graphql_cache import NotCacheable, get_operation_tables
+
+
+def test_response_cache_lru():
+    cache = ResponseCache(max_bytes=20)
+    cache.put(("a",), CachedResponse(b"x" * 8, {}, frozenset({"item"})))
+    cache.put(("b",), CachedResponse(b"x" * 8, {}, frozenset({"skill"})))
+    assert cache.get(("a",)) is not None  # now more recently used than b
+    cache.put(("c",), CachedResponse(b"x" * 8, {}, frozenset({"skill"})))
+
+    assert cache.get(("b",)) is None
+    assert cache.size == 16
+    cache.invalidate({"skill"})
+    assert cache.get(("c",)) is None
+    assert cache.get(("a",)) is not None
+    assert (cache.stats.hits, cache.stats.misses, cache.stats.evictions, cache.stats.invalidations) == (2, 2, 1, 1)
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_response_cache_invalidation(client: TestClient):
+    for url in ["item", "recipe", "wisdom", "skill/s.bells"]:
+        first = client.get(url)
+        assert client.get(url).content == first.content
+    stats = client.get("_cache").json()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (4, 4, 4)
+
+    # recipes and wisdoms embed skills, items don’t
+    skill = client.get("skill/s.bells").json()
+    assert client.put("skill/s.bells", json={**skill, "level": 2}).status_code == 200
+    stats = client.get("_cache").json()
+    assert (stats["entries"], stats["invalidations"]) == (1, 3)
+    assert client.get("skill/s.bells").json()["level"] == 2
+
+
+def test_operation_tables():
+    query = """
+        query Skills { skill(where: { wisdoms: { id: { _eq: "w.bosk" } } }) { ...skill } }
+        fragment skill on skill { id recipes { id } }
+    """
+    assert get_operation_tables(parse(query), "Skills") == {"skill", "skill_wisdom", "wisdom", "recipe_skill", "recipe"}
+    assert get_operation_tables(parse("query { __typename }"), None) == set()
+    for query in [
+        "query ($where: skill_bool_exp) { skill(where: $where) { id } }",  # could refer to any table
+        'mutation { delete_skill(where: { id: { _eq: "s.bells" } }) { affected_rows } }',
+        "query { skill { ...a } } fragment a on skill { id recipes { skills { ...a } } }",  # cyclic
+        "query { skill { ...a } } fragment a on skill { ...b } fragment b on skill { id ...a }",
+    ]:
+        with pytest.raises(NotCacheable):
+            get_operation_tables(parse(query), None)
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_graphql_result_cache(client: TestClient):
+    queries = {
+        "item": "query { item { id aspects { id } } }",
+        "skill": "query Skills { skill { id level } }",
+    }
+    for query in queries.values():
+        first = client.post("/graphql", json={"query": query})
+        assert client.post("/graphql", json={"query": " ".join(query.split())}).content == first.content
+    stats = client.get("_cache").json()["graphql"]
+    assert (stats["entries"], stats["hits"], stats["misses"], stats["hit_rate"]) == (2, 2, 2, 0.5)
+
+    # only the skill query reads the written table
+    skill = client.get("skill/s.bells").json()
+    assert client.put("skill/s.bells", json={**skill, "level": 2}).status_code == 200
+    stats = client.get("_cache").json()["graphql"]
+    assert (stats["entries"], stats["invalidations"]) == (1, 1)
+    skills = client.post("/graphql", json={"query": queries["skill"]}).json()["data"]["skill"]
+    assert {"id": "s.bells", "level": 2} in skills
+
+
+def test_graphql_cyclic_fragments(client: TestClient):
+    """Cyclic fragments fail validation, instead of the cache and the cost estimate expanding them forever."""
+    query = "query { skill { ...a } } fragment a on skill { id recipes { skills { ...a } } }"
+    result = client.post("/graphql", json={"query": query})
+    assert result.status_code == 400
+    assert [error["message"] for error in result.json()["errors"]] == ["Cannot spread fragment 'a' within itself."]
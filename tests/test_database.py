@@ -0,0 +1,105 @@
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from boh_app.data.load_data import load_all
+from boh_app.database import build_snapshot, create_db_engine, delete_db, init_db
+from boh_app.models import Item, Recipe
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_init_db_from_snapshot(tmp_path: Path):
+    snapshot = tmp_path / "snapshot.sqlite"
+    build_snapshot(snapshot)
+
+    engine = create_db_engine(f"sqlite+pysqlite:///{tmp_path}/db.sqlite")
+    mk_session = sessionmaker(autoflush=False, bind=engine)
+    init_db(engine=engine, mk_session=mk_session, snapshot=snapshot)
+
+    with mk_session() as session:
+        assert load_all(session) == []  # nothing left to load
+        with session.begin():
+            recipe = session.get(Recipe, "lamp_lantern_brass")
+            assert recipe is not None
+            assert [s.id for s in recipe.skills] == ["s.bells"]
+
+
+def test_delete_db(tmp_path: Path):
+    """A WAL file left behind by a killed process isn’t replayed into the next database."""
+    path = tmp_path / "db.sqlite"
+    engine = create_db_engine(f"sqlite+pysqlite:///{path}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (x)")
+    conn = engine.raw_connection()  # keeps the WAL file, like a process that didn’t shut down
+    (tmp_path / "db.sqlite.lock").touch()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["db.sqlite", "db.sqlite-shm", "db.sqlite-wal", "db.sqlite.lock"]
+
+    delete_db(path)
+    assert list(tmp_path.iterdir()) == []
+    conn.close()
+    engine.dispose()
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_load_db_concurrently(tmp_path: Path):
+    """Processes starting at the same time initialize the database only once."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from boh_app.database import load_db
+
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path}/db.sqlite")
+    mk_session = sessionmaker(autoflush=False, bind=engine)
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda _: load_db(engine, mk_session, snapshot=None), range(4)))
+
+    assert sorted(map(bool, results)) == [False, False, False, True]
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_storage_profile(tmp_path: Path):
+    """Readers see the last committed state while a write is in progress, instead of waiting for it."""
+    engine = create_db_engine(f"sqlite+pysqlite:///{tmp_path}/db.sqlite")
+    mk_session = sessionmaker(autoflush=False, bind=engine)
+    init_db(engine=engine, mk_session=mk_session, snapshot=None)
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+
+    with mk_session() as writer, mk_session() as reader:
+        writer.execute(update(Item).where(Item.id == "candle").values(known=True))
+        assert reader.get(Item, "candle").known is False
+        writer.commit()
+        reader.rollback()
+        assert reader.get(Item, "candle").known is True
+
+
+def test_storage_profile_settings(tmp_path: Path):
+    """The PRAGMAs and pool size of `get_engine` are configured by environment variables, which are read on import."""
+    import json
+    import os
+    import subprocess
+    import sys
+
+    script = (
+        "import json; from boh_app.database import get_engine; engine = get_engine()\n"
+        "with engine.connect() as conn:\n"
+        "    pragmas = {p: conn.exec_driver_sql(f'PRAGMA {p}').scalar() for p in ['synchronous', 'busy_timeout']}\n"
+        "print(json.dumps({**pragmas, 'pool_size': engine.pool.size()}))"
+    )
+    env = {
+        **os.environ,
+        "XDG_CACHE_HOME": str(tmp_path),
+        "BOH_APP_SQLITE_SYNCHRONOUS": "full",
+        "BOH_APP_SQLITE_BUSY_TIMEOUT": "1234",
+        "BOH_APP_DB_POOL_SIZE": "3",
+    }
+    proc = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=False)  # noqa: S603
+    assert proc.returncode == 0, proc.stderr
+    assert json.loads(proc.stdout) == {"synchronous": 2, "busy_timeout": 1234, "pool_size": 3}
+
+    env["BOH_APP_SQLITE_JOURNAL_MODE"] = "wall"
+    proc = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=False)  # noqa: S603
+    assert "Invalid journal_mode 'WALL'" in proc.stderr
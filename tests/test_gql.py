@@ -1,10 +1,26 @@
+import threading
 from collections.abc import Callable
 from functools import partial
 from typing import Any, LiteralString
 
 import pytest
-from sqlalchemy.orm import Session
+from fastapi.testclient import TestClient
+from graphql import GraphQLError, parse, validate
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, sessionmaker
 
+from boh_app.graphql import get_gql_schema
+from boh_app.graphql_cost import CostEstimator, make_cost_rule, make_cost_rules
+from boh_app.models import Item
+from boh_app.persisted_queries import (
+    PERSISTED_QUERIES_PATH,
+    PERSISTED_QUERY_NOT_FOUND,
+    PERSISTED_QUERY_REQUIRED,
+    DocumentCache,
+    extract_persisted_queries,
+    get_query_hash,
+    render_persisted_queries,
+)
 from boh_app.utils import gql_query
 
 
@@ -28,3 +44,166 @@ def test_qgl_serializer(query):
     )["assistant"]
     assert assistant["id"] == "Coffinmaker"
     assert {a["id"] for a in assistant["aspects"]} == {"wood", "sustenance", "beverage", "memory", "tool", "soul"}
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_gql_batched_relationships(query, db_session: Session):
+    statements: list[str] = []
+
+    def listener(_conn, _cursor, statement, *_):
+        statements.append(statement)
+
+    event.listen(db_session.get_bind(), "before_cursor_execute", listener)
+    try:
+        result = query(
+            """query {
+                workstation { id workstation_slots { id accepts { id } } evolves { id } }
+                item { id aspects { id } source_recipe { id skills { id } } }
+            }"""
+        )
+    finally:
+        event.remove(db_session.get_bind(), "before_cursor_execute", listener)
+    # one per root field and relationship, however many rows there are
+    assert len(statements) == 2 + 3 + 3, statements
+    [workbench, desk] = sorted(result["workstation"], key=lambda w: w["id"], reverse=True)
+    assert {slot["id"]: {a["id"] for a in slot["accepts"]} for slot in workbench["workstation_slots"]} == {
+        "Tool": {"tool"},
+        "Light": {"light", "fuel"},
+    }
+    assert (workbench["evolves"], desk["evolves"]) == ({"id": "Illumination"}, None)
+    lamp = next(item for item in result["item"] if item["id"] == "lamp")
+    assert {a["id"] for a in lamp["aspects"]} == {"light", "tool"}
+    assert lamp["source_recipe"] == [{"id": "lamp_lantern_brass", "skills": [{"id": "s.bells"}]}]
+
+
+def test_gql_request_session(client: TestClient, db_session: Session):
+    threads: list[str] = []
+
+    def listener(_state):
+        threads.append(threading.current_thread().name)
+
+    # `client` makes the request use `db_session`
+    event.listen(db_session, "do_orm_execute", listener)
+    try:
+        response = client.post("/graphql", json={"query": 'query { assistant(where: { id: { _eq: "Coffinmaker" } }) { id } }'})
+    finally:
+        event.remove(db_session, "do_orm_execute", listener)
+    assert response.json()["data"] == {"assistant": [{"id": "Coffinmaker"}]}
+    assert threads
+    assert all(name.startswith("graphql") for name in threads), threads
+
+
+def test_gql_websocket(client: TestClient):
+    """Operations over a WebSocket run on a session of their own, which is closed afterwards."""
+    mk_session = client.app.state.mk_session
+    closed = []
+
+    def mk_tracked_session() -> Session:
+        session = mk_session()
+        close = session.close
+        session.close = lambda: closed.append(session) or close()
+        return session
+
+    client.app.state.mk_session = mk_tracked_session
+    query = 'query { assistant(where: { id: { _eq: "Coffinmaker" } }) { id } }'
+    with client.websocket_connect("/graphql", subprotocols=["graphql-transport-ws"]) as websocket:
+        websocket.send_json({"type": "connection_init"})
+        assert websocket.receive_json()["type"] == "connection_ack"
+        for id_ in ["1", "2"]:  # the second result comes from the result cache
+            websocket.send_json({"type": "subscribe", "id": id_, "payload": {"query": query}})
+            message = websocket.receive_json()
+            assert (message["type"], message["payload"]["data"]) == ("next", {"assistant": [{"id": "Coffinmaker"}]})
+            assert websocket.receive_json() == {"type": "complete", "id": id_}
+    assert len(closed) == 2
+    assert client.app.state.graphql_cache.stats.hits == 1
+
+
+def test_persisted_queries_up_to_date():
+    assert PERSISTED_QUERIES_PATH.read_text() == render_persisted_queries(extract_persisted_queries()), (
+        "run `boh_app gen-persisted-queries`"
+    )
+
+
+def test_gql_persisted_query(client: TestClient):
+    [query] = [query for query in extract_persisted_queries().values() if query.startswith("query Aspects")]
+    extensions = {"persistedQuery": {"version": 1, "sha256Hash": get_query_hash(query)}}
+    response = client.post("/graphql", json={"extensions": extensions})
+    assert response.status_code == 200, response.json()
+    assert {"id": "wood", "assistants": [{"id": "Coffinmaker"}]} in response.json()["data"]["aspect"]
+
+    extensions["persistedQuery"]["sha256Hash"] = get_query_hash("query { skill { id } }")
+    [error] = client.post("/graphql", json={"extensions": extensions}).json()["errors"]
+    assert error["message"] == PERSISTED_QUERY_NOT_FOUND
+
+
+def test_document_cache():
+    persisted = extract_persisted_queries()
+    [query] = [query for query in persisted.values() if query.startswith("query Skills")]
+    documents = DocumentCache(persisted, persisted_only=True)
+    reformatted = " ".join(query.split())
+    document = documents.parse(None, {"query": reformatted})
+    assert document is documents.parse(None, {"query": query})
+    assert documents.validate(get_gql_schema(), document) == []
+    with pytest.raises(GraphQLError, match=PERSISTED_QUERY_REQUIRED):
+        documents.parse(None, {"query": "query { skill { id } }"})
+
+    documents = DocumentCache(persisted)
+    document = documents.parse(None, {"query": "query { skill { id nope } }"})
+    assert document is documents.parse(None, {"query": "query { skill { id nope } }"})
+    [error] = documents.validate(get_gql_schema(), document)
+    assert documents.validate(get_gql_schema(), document) == [error]
+    assert documents.validate(get_gql_schema(), document, rules=[]) == []  # not the result for other rules
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_gql_cost(db_session: Session):
+    estimator = CostEstimator(sessionmaker(bind=db_session.get_bind()))
+    stats = estimator.stats
+    items = stats.rows[inspect(Item)]
+    aspects_per_item = stats.fanouts[inspect(Item).relationships["aspects"]]
+    cost = estimator.estimate(parse("query { item(limit: 2) { id aspects { id } } }"), None)
+    assert (cost.depth, cost.cost) == (2, round(2 + 2 * aspects_per_item))
+    # equal operations (AST nodes compare by structure) whose fragments differ have their own cost
+    flat, nested = (
+        parse(f"query {{ item(limit: 2) {{ ...f }} }} fragment f on item {{ {fields} }}", no_location=True)
+        for fields in ["id", "aspects { id }"]
+    )
+    assert flat.definitions[0] == nested.definitions[0]
+    assert [estimator.estimate(document, None).cost for document in [flat, nested]] == [2, round(2 + 2 * aspects_per_item)]
+
+    # each level multiplies the objects to resolve
+    query = "query Explode { item { aspects { items { aspects { items { id } } } } } }"
+    cost = estimator.estimate(parse(query), "Explode")
+    assert cost.depth == 5
+    assert cost.cost > 3 * items
+    rule = make_cost_rule(estimator, max_depth=4, max_cost=items)
+    errors = validate(get_gql_schema(), parse(query), [rule])
+    assert [error.message for error in errors] == [
+        "Query depth 5 exceeds the maximum of 4",
+        f"Query cost {cost.cost:,} exceeds the maximum of {items:,}",
+    ]
+    assert errors[1].extensions == {"cost": cost.cost, "max_cost": items}
+    assert not validate(get_gql_schema(), parse("query { __schema { types { fields { type { ofType { ofType { name } } } } } } }"), [rule])
+    cyclic = "query { item { ...a } } fragment a on item { aspects { items { ...a } } }"  # reported by `NoFragmentCyclesRule`
+    assert not validate(get_gql_schema(), parse(cyclic), [rule])
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_gql_cost_stats_reload(db_session: Session):
+    estimator = CostEstimator(sessionmaker(bind=db_session.get_bind()), ttl=0)
+    get_rules = make_cost_rules(estimator, max_depth=8, max_cost=1000)
+    stats, rules = estimator.stats, get_rules()
+    assert (estimator.stats, get_rules()) == (stats, rules)  # the table versions are the same
+    with db_session.begin():
+        db_session.add(Item(id="mirror", name="Mirror"))
+    assert estimator.stats.rows[inspect(Item)] == stats.rows[inspect(Item)] + 1
+    assert get_rules() != rules  # so validation results memoized by rules aren’t reused
+
+
+def test_gql_cost_extension(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    estimates = []
+    estimate_operation = CostEstimator.estimate_operation
+    monkeypatch.setattr(CostEstimator, "estimate_operation", lambda *args: estimates.append(estimate_operation(*args)) or estimates[-1])
+    response = client.post("/graphql", json={"query": 'query { assistant_by_pk(id: "Coffinmaker") { id aspects { id } } }'})
+    assert response.json()["extensions"]["cost"] >= 1
+    assert len(estimates) == 1  # by validation, and reused for the extension
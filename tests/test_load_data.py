@@ -0,0 +1,68 @@
+import json
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from boh_app.data import load_data
+from boh_app.data.bulk import bulk_load
+from boh_app.models import Aspect, Base, get_tablename_model_mapping
+from boh_app.versions import get_versions
+
+
+def test_load_all_skips_unchanged(db_session: Session):
+    assert load_data.load_all(db_session) == []
+
+
+def test_load_all_reloads_changed(db_session: Session, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    data_file_paths = load_data.find_files()
+    aspect_path = tmp_path / "aspect.json"
+    aspect_path.write_text(json.dumps([*load_data.get_data("aspect"), {"id": "test_value"}]))
+    monkeypatch.setattr(load_data, "find_files", lambda: {**data_file_paths, "aspect": aspect_path})
+    with db_session.begin():
+        versions = get_versions(db_session, ["aspect", "wisdom"])
+
+    assert load_data.load_all(db_session) == ["aspect"]
+    with db_session.begin():
+        assert db_session.get(Aspect, "test_value") is not None
+        new_versions = get_versions(db_session, ["aspect", "wisdom"])
+    assert new_versions["aspect"] > versions["aspect"]
+    assert new_versions["wisdom"] == versions["wisdom"]
+    assert load_data.load_all(db_session) == []
+
+
+def normalize(data: Any) -> Any:
+    """Sort lists and drop generated IDs so data loaded in different ways can be compared."""
+    if isinstance(data, dict):
+        return {k: normalize(v) for k, v in data.items() if not (k == "id" and isinstance(v, int))}
+    if isinstance(data, list):
+        return sorted((normalize(v) for v in data), key=json.dumps)
+    return data
+
+
+def load_and_dump(loader: Callable[..., Any], db_path: Path) -> dict[str, Any]:
+    engine = create_engine(f"sqlite+pysqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(autoflush=False, bind=engine)()
+    tablename2model = get_tablename_model_mapping()
+    data_file_paths = load_data.find_files()
+    for table in load_data.get_sorted_tables():
+        if path := data_file_paths.get(table.fullname):
+            with session.begin():
+                loader(json.loads(path.read_text()), tablename2model[table.fullname], session=session)
+    with session.begin():
+        return {
+            name: normalize([model.__pydantic__.model_validate(obj).model_dump(mode="json") for obj in session.scalars(select(model))])
+            for name, model in tablename2model.items()
+            if name != "principle_count"  # marshmallow creates duplicates
+        }
+
+
+@pytest.mark.usefixtures("generated_data")
+def test_bulk_load_matches_marshmallow(tmp_path: Path):
+    expected = load_and_dump(load_data.add_data, tmp_path / "marshmallow.sqlite")
+    assert expected["recipe"], "generated data not loaded"
+    assert load_and_dump(bulk_load, tmp_path / "bulk.sqlite") == expected
@@ -1,6 +1,11 @@
+import sys
+
 import pytest
 
-from boh_app import models
+from boh_app import models, serializers
+from boh_app.serializers import generated, setup_schema
+from boh_app.serializers.codegen import GENERATED_PATH, render_module
+from boh_app.serializers.pydantic import SYNTH_MODULE
 
 
 def test_rest_serializer(client):
@@ -11,8 +16,33 @@ def test_rest_serializer(client):
     assert asp_names == {"fuel", "sustenance", "beverage", "memory", "tool", "soul"}
 
 
+@pytest.mark.usefixtures("db_session")
 @pytest.mark.parametrize("model", models.get_tablename_model_mapping().values())
 def test_pydantic_v_marshmallow(model: type[models.Base]):
     marshmallow = model.__marshmallow__()
     pydantic = model.__pydantic__
     assert set(marshmallow.declared_fields.keys()) == set(pydantic.model_fields.keys())
+
+
+def test_serializers_lazy(db_session):
+    setup_schema(models.Base, session=db_session)
+    assert "__pydantic__" not in vars(models.Item)
+
+    assert models.Item.__pydantic__ is generated.ItemModel
+    assert "__pydantic__" in vars(models.Item)
+    assert "__pydantic__" not in vars(models.Skill)
+
+
+def test_serializers_reflected(db_session, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(serializers, "get_generated_module", lambda: None)
+    setup_schema(models.Base, session=db_session)
+    assert "AspectFlatModel" not in vars(sys.modules[SYNTH_MODULE])
+
+    assert models.Item.__pydantic__.__name__ == "ItemModel"
+    assert models.Item.__pydantic__ is not generated.ItemModel
+    assert "AspectFlatModel" in vars(sys.modules[SYNTH_MODULE])  # resolved on demand
+    setup_schema(models.Base, session=db_session)  # don’t leak reflected models
+
+
+def test_generated_up_to_date():
+    assert GENERATED_PATH.read_text() == render_module(serializers.reflect_pydantic_models(models.Base)), "run `boh_app gen-serializers`"
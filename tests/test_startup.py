@@ -0,0 +1,96 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+# wall-clock budgets, only checked with `BOH_APP_TIMING_TESTS=1` as they depend on the machine and its load:
+# measured at ~1.1 s for the import (mostly fastapi, sqlalchemy, pydantic and ariadne) and ~0.45 s for a cold startup;
+# 1.5× that, so a regression like importing the schema eagerly again fails the test
+IMPORT_BUDGET = 1.7
+STARTUP_BUDGET = 0.7
+TIMING_TESTS = os.environ.get("BOH_APP_TIMING_TESTS", "").lower() not in {"", "0", "false"}
+
+SCRIPT = """
+import json, sys, time
+
+start = time.perf_counter()
+from boh_app.server import app, create_app, startup
+
+import_time = time.perf_counter() - start
+
+import boh_app.server
+from boh_app import serializers
+from boh_app.database import get_engine
+from boh_app.graphql import get_gql_schema
+
+side_effects = {"engine": get_engine.cache_info().currsize, "gql_schema": get_gql_schema.cache_info().currsize}
+
+reflected = []
+for name in ["reflect_flat", "reflect_nested", "reflect_put"]:
+    reflect = getattr(serializers, name)
+    setattr(serializers, name, lambda class_, reflect=reflect: reflected.append(class_.__name__) or reflect(class_))
+loaded = []
+load_db = boh_app.server.load_db
+boh_app.server.load_db = lambda *args, **kwargs: loaded.append(load_db(*args, **kwargs)) or loaded[-1]
+
+from sqlalchemy import create_engine
+
+engine = create_engine(sys.argv[1])
+# a cold start, then a warm one on the same database
+phases = [startup(api_app, engine=engine, snapshot=None).phases for api_app in [app, create_app(engine, snapshot=None)]]
+print(json.dumps({"import": import_time, "phases": phases, "side_effects": side_effects, "reflected": reflected, "loaded": loaded}))
+"""
+
+
+@pytest.fixture(scope="module")
+def startup_result(tmp_path_factory: pytest.TempPathFactory) -> dict[str, Any]:
+    tmp_path = tmp_path_factory.mktemp("startup")
+    env = {**os.environ, "XDG_CACHE_HOME": str(tmp_path / "cache")}
+    proc = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", SCRIPT, f"sqlite+pysqlite:///{tmp_path}/db.sqlite"], env=env, capture_output=True, text=True, check=False
+    )
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout)
+
+
+def test_startup_side_effects(startup_result: dict[str, Any]):
+    """Importing creates no engine or schema, startup reflects no serializers, and a warm start loads no data files."""
+    assert startup_result["side_effects"] == {"engine": 0, "gql_schema": 0}
+    assert startup_result["reflected"] == []
+    cold, warm = startup_result["phases"]
+    assert set(cold) == set(warm) == {"mappers", "schema synthesis", "GraphQL build", "data load"}
+    assert startup_result["loaded"][0]
+    assert startup_result["loaded"][1] == []
+
+
+@pytest.mark.skipif(not TIMING_TESTS, reason="set BOH_APP_TIMING_TESTS=1 to check the startup time")
+def test_startup_budget(startup_result: dict[str, Any]):
+    cold, _warm = startup_result["phases"]
+    assert startup_result["import"] < IMPORT_BUDGET
+    assert sum(cold.values()) < STARTUP_BUDGET, cold
+
+
+def test_startup_worker(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    """Workers of a multi-process server leave initializing the database to the parent process, and read on connections that can’t write."""
+    from sqlalchemy import create_engine, inspect
+
+    from boh_app.server import create_app, startup
+    from boh_app.settings import DB_INITIALIZED_ENV
+
+    monkeypatch.setenv(DB_INITIALIZED_ENV, "1")
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path}/db.sqlite")
+    app = create_app(engine, snapshot=None)
+    profile = startup(app, engine=engine, snapshot=None)
+
+    assert "data load" not in profile.phases
+    assert inspect(engine).get_table_names() == []
+    with app.state.mk_read_session() as session:
+        assert session.connection().exec_driver_sql("PRAGMA query_only").scalar() == 1
+    with app.state.mk_session() as session:
+        assert session.connection().exec_driver_sql("PRAGMA query_only").scalar() == 0
+    app.state.read_engine.dispose()
+    app.state.graphql_executor.shutdown()